@@ -0,0 +1,216 @@
+import argparse
+import copy
+import csv
+import json
+import queue
+import sys
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+from simulation import add_warehouse_arguments, warehouse_from_args
+
+
+def read_orders(filename):
+    # Lazily yields (order_id, items). JSON lines are either a list of items
+    # or an object with "items" and an optional "order_id". CSV files need
+    # the columns order_id and items, with items separated by ";". Orders
+    # default to their line number, malformed lines are passed on as they
+    # are for simulate_chunk() to report
+    if filename.endswith(".csv"):
+        with open(filename, newline="") as csvfile:
+            reader = csv.DictReader(csvfile)
+            for row in reader:
+                items = row.get("items")
+                if items is not None:
+                    items = [item for item in items.split(";") if item]
+                yield row.get("order_id") or reader.line_num, items
+        return
+
+    with open(filename) as orders_file:
+        for line_number, line in enumerate(orders_file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_number, line
+                continue
+            if isinstance(record, dict):
+                yield record.get("order_id", line_number), record.get("items")
+            else:
+                yield line_number, record
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def simulate_chunk(warehouse, chunk, include_path=False):
+    results = []
+    for order_id, items in chunk:
+        result = {"order_id": order_id, "items": items}
+        try:
+            if not isinstance(items, list):
+                raise ValueError("Order needs a list of items")
+            if include_path:
+                path, distances, total_distance = warehouse.simulate_order(items)
+                result["path"] = path
+            else:
+                distances, total_distance = warehouse.order_distances(items)
+            result["distances"] = distances
+            result["total_distance"] = total_distance
+        except (ValueError, TypeError) as error:
+            result["error"] = str(error)
+        results.append(result)
+    return results
+
+
+_worker_warehouse = None
+_worker_include_path = False
+
+
+def _init_worker(warehouse, include_path, cache_dir):
+    global _worker_warehouse, _worker_include_path
+    _worker_warehouse = warehouse
+    _worker_include_path = include_path
+    if cache_dir and warehouse.distance_matrix is None:
+        warehouse.load_or_build_distance_matrix(cache_dir)
+
+
+def _simulate_worker_chunk(chunk):
+    return simulate_chunk(_worker_warehouse, chunk, _worker_include_path)
+
+
+def simulate_stream(
+    warehouse,
+    orders,
+    processes=None,
+    chunk_size=1000,
+    include_path=False,
+    ordered=True,
+    cache_dir=None,
+):
+    # Generator over result dicts. At most two chunks per process are in
+    # flight, so memory stays bounded no matter how long the order stream is
+    if cache_dir:
+        # Build the matrix once here so the workers only have to load it
+        warehouse.load_or_build_distance_matrix(cache_dir, processes=processes)
+
+    chunks = chunked(orders, chunk_size)
+    if not processes or processes <= 1:
+        for chunk in chunks:
+            yield from simulate_chunk(warehouse, chunk, include_path)
+        return
+
+    worker_warehouse = warehouse
+    if cache_dir:
+        # Workers load the matrix from the cache file, pickling it into
+        # every worker as well would copy it twice
+        worker_warehouse = copy.copy(warehouse)
+        worker_warehouse.distance_matrix = None
+        worker_warehouse.parent_matrix = None
+        worker_warehouse._point_index = {}
+
+    with Pool(
+        processes,
+        initializer=_init_worker,
+        initargs=(worker_warehouse, include_path, cache_dir),
+    ) as pool:
+        # Ordered results come back in submission order, unordered ones
+        # are pushed by the completion callbacks as soon as they finish
+        pending = deque()
+        finished = queue.SimpleQueue()
+        in_flight = 0
+        for chunk in chunks:
+            if ordered:
+                pending.append(pool.apply_async(_simulate_worker_chunk, (chunk,)))
+            else:
+                pool.apply_async(
+                    _simulate_worker_chunk,
+                    (chunk,),
+                    callback=finished.put,
+                    error_callback=finished.put,
+                )
+            in_flight += 1
+            while in_flight >= 2 * processes:
+                yield from _next_ready(pending, finished, ordered)
+                in_flight -= 1
+
+        while in_flight:
+            yield from _next_ready(pending, finished, ordered)
+            in_flight -= 1
+
+
+def _next_ready(pending, finished, ordered):
+    if ordered:
+        return pending.popleft().get()
+    results = finished.get()
+    if isinstance(results, BaseException):
+        raise results
+    return results
+
+
+def write_results(results, filename):
+    # Streams results to a JSON lines or CSV file, returns the result count
+    count = 0
+    with open(filename, "w", newline="") as output:
+        if filename.endswith(".csv"):
+            writer = csv.writer(output)
+            writer.writerow(["order_id", "distances", "total_distance", "error"])
+            for result in results:
+                writer.writerow(
+                    [
+                        result["order_id"],
+                        ";".join(str(d) for d in result.get("distances", [])),
+                        result.get("total_distance", ""),
+                        result.get("error", ""),
+                    ]
+                )
+                count += 1
+        else:
+            for result in results:
+                output.write(json.dumps(result))
+                output.write("\n")
+                count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a stream of orders")
+    parser.add_argument("orders", help="JSON lines or CSV file with orders")
+    parser.add_argument("output", help="JSON lines or CSV file for the results")
+    add_warehouse_arguments(parser)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--cache-dir", help="directory for the distance matrix")
+    parser.add_argument("--include-path", action="store_true")
+    parser.add_argument("--unordered", action="store_true")
+    args = parser.parse_args(argv)
+
+    warehouse = warehouse_from_args(args)
+
+    started = time.perf_counter()
+    results = simulate_stream(
+        warehouse,
+        read_orders(args.orders),
+        processes=args.processes,
+        chunk_size=args.chunk_size,
+        include_path=args.include_path,
+        ordered=not args.unordered,
+        cache_dir=args.cache_dir,
+    )
+    count = write_results(results, args.output)
+    elapsed = time.perf_counter() - started
+    print(f"Simulated {count} orders in {elapsed:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+import heapq
+
+import numpy as np
+
+from sequencing import UNREACHABLE
+
+
+class BatchPlanner:
+    # Groups orders into picking waves that are walked as one tour from
+    # start to printer. Batch routes are kept as lists of pick point indices
+    # into the warehouse distance matrix and grown by cheapest insertion, so
+    # evaluating a candidate order never re-routes the whole batch
+    def __init__(self, warehouse, capacity, max_orders=None, neighbours=20):
+        self.warehouse = warehouse
+        # Cart capacity in items
+        self.capacity = capacity
+        self.max_orders = max_orders
+        # Only this many nearby orders are considered when growing a batch
+        self.neighbours = neighbours
+
+        if warehouse.distance_matrix is None or any(
+            location not in warehouse._point_index
+            for location in warehouse.pick_points()
+        ):
+            warehouse.build_distance_matrix()
+        warehouse.refresh_distance_matrix()
+
+        matrix = warehouse.distance_matrix.astype(np.int64)
+        self._matrix = np.where(matrix < 0, UNREACHABLE, matrix)
+        self._distances = self._matrix.tolist()
+        self._start = warehouse._point_index[warehouse.start]
+        self._printer = warehouse._point_index[warehouse.printer]
+
+    def _locations(self, items):
+        locations = []
+        for item in items:
+            item_location = self.warehouse.item_locations.get(item)
+            if not item_location:
+                raise ValueError(f"Item {item} location not found")
+            locations.append(self.warehouse._point_index[item_location])
+        return locations
+
+    def insert(self, route, locations):
+        # Cheapest insertion of locations into route. Returns the added cost
+        # and the new route, route itself is left untouched
+        distances = self._distances
+        route = list(route)
+        added = 0
+        for location in locations:
+            if location in route:
+                continue
+            best_delta = None
+            best_position = 0
+            previous = self._start
+            for position in range(len(route) + 1):
+                following = route[position] if position < len(route) else self._printer
+                delta = (
+                    distances[previous][location]
+                    + distances[location][following]
+                    - distances[previous][following]
+                )
+                if best_delta is None or delta < best_delta:
+                    best_delta = delta
+                    best_position = position
+                previous = following
+            route.insert(best_position, location)
+            added += best_delta
+        return added, route
+
+    def route_cost(self, route):
+        distances = self._distances
+        cost = 0
+        previous = self._start
+        for location in route:
+            cost += distances[previous][location]
+            previous = location
+        return cost + distances[previous][self._printer]
+
+    def plan(self, orders, method="savings"):
+        # orders maps order ids to item lists, returns a list of batches,
+        # each a list of order ids
+        order_ids = list(orders)
+        if not order_ids:
+            return []
+        locations = [self._locations(orders[order_id]) for order_id in order_ids]
+        sizes = [len(orders[order_id]) for order_id in order_ids]
+        for order_id, size in zip(order_ids, sizes):
+            if size > self.capacity:
+                raise ValueError(f"Order {order_id} exceeds the cart capacity")
+
+        routes = []
+        costs = []
+        empty_cost = self.route_cost([])
+        for order_locations in locations:
+            added, route = self.insert([], order_locations)
+            routes.append(route)
+            costs.append(empty_cost + added)
+
+        # The location farthest from start and printer stands in for the
+        # order when looking for nearby orders
+        distances = self._distances
+        anchors = np.array(
+            [
+                max(
+                    route,
+                    key=lambda location: distances[self._start][location]
+                    + distances[location][self._printer],
+                    default=self._start,
+                )
+                for route in routes
+            ]
+        )
+
+        if method == "seed":
+            batches = self._plan_seed(routes, costs, sizes, anchors)
+        elif method == "savings":
+            batches = self._plan_savings(routes, costs, sizes, anchors)
+        else:
+            raise ValueError(f"Unknown batching method {method}")
+        return [[order_ids[index] for index in batch] for batch in batches]
+
+    def _nearest(self, anchors, index, candidates=None):
+        # Indices of the orders whose anchors are closest to the anchor of
+        # order index, in both walking directions
+        anchor = anchors[index]
+        if candidates is None:
+            candidates = np.arange(len(anchors))
+        proximity = (
+            self._matrix[anchor, anchors[candidates]]
+            + self._matrix[anchors[candidates], anchor]
+        )
+        count = min(self.neighbours + 1, len(candidates))
+        nearest = np.argpartition(proximity, count - 1)[:count]
+        nearest = nearest[np.argsort(proximity[nearest], kind="stable")]
+        return [int(candidates[i]) for i in nearest if candidates[i] != index]
+
+    def _fits(self, load, orders, size):
+        if load + size > self.capacity:
+            return False
+        return self.max_orders is None or orders < self.max_orders
+
+    def _plan_seed(self, routes, costs, sizes, anchors):
+        # Start each batch with the remaining order that is most expensive
+        # on its own, then add the nearby order with the cheapest insertion
+        # until the cart is full
+        remaining = set(range(len(routes)))
+        by_cost = sorted(remaining, key=lambda index: -costs[index])
+        batches = []
+        for seed in by_cost:
+            if seed not in remaining:
+                continue
+            remaining.remove(seed)
+            batch = [seed]
+            route = routes[seed]
+            load = sizes[seed]
+            if remaining:
+                candidates = np.fromiter(remaining, dtype=np.int64)
+                candidates = self._nearest(anchors, seed, candidates)
+            else:
+                candidates = []
+            while candidates:
+                best = None
+                for candidate in candidates:
+                    if not self._fits(load, len(batch), sizes[candidate]):
+                        continue
+                    added, candidate_route = self.insert(route, routes[candidate])
+                    if best is None or added < best[0]:
+                        best = (added, candidate, candidate_route)
+                if best is None:
+                    break
+                _, candidate, route = best
+                candidates.remove(candidate)
+                remaining.remove(candidate)
+                batch.append(candidate)
+                load += sizes[candidate]
+            batches.append(batch)
+        return batches
+
+    def _plan_savings(self, routes, costs, sizes, anchors):
+        # Clarke-Wright style: start with one batch per order and repeatedly
+        # merge the pair of batches with the largest saving that still fits.
+        # A merged batch is paired again with the batches holding the orders
+        # nearest to any of its members and with every batch either half
+        # was paired with. A batch left without partners looks for new ones
+        owner = np.arange(len(routes))
+        # Load and order count of the batch each order belongs to
+        owner_loads = np.array(sizes, dtype=np.int64)
+        owner_orders = np.ones(len(routes), dtype=np.int64)
+        members = {index: [index] for index in range(len(routes))}
+        batch_routes = {index: routes[index] for index in range(len(routes))}
+        batch_costs = {index: costs[index] for index in range(len(routes))}
+        loads = {index: sizes[index] for index in range(len(routes))}
+        versions = {index: 0 for index in range(len(routes))}
+        partners = {index: set() for index in range(len(routes))}
+
+        heap = []
+
+        def nearby(batch):
+            # Batches owning the orders closest to any member of batch,
+            # among those that still fit together with it
+            inside = members[batch]
+            fits = owner_loads + loads[batch] <= self.capacity
+            if self.max_orders is not None:
+                fits &= owner_orders + len(inside) <= self.max_orders
+            fits[inside] = False
+            candidates = np.flatnonzero(fits)
+            if not len(candidates):
+                return set()
+            member_anchors = anchors[inside]
+            proximity = (
+                self._matrix[np.ix_(member_anchors, anchors[candidates])]
+                + self._matrix[np.ix_(anchors[candidates], member_anchors)].T
+            ).min(axis=0)
+            count = min(self.neighbours, len(candidates))
+            nearest = np.argpartition(proximity, count - 1)[:count]
+            return {int(owner[candidates[index]]) for index in nearest}
+
+        def pair(batch, other):
+            # Loads only grow, a pair that does not fit never will
+            if not self._fits(
+                loads[batch],
+                len(members[batch]) + len(members[other]) - 1,
+                loads[other],
+            ):
+                return
+            partners[batch].add(other)
+            partners[other].add(batch)
+            # The shorter route is inserted into the longer one
+            if len(batch_routes[other]) > len(batch_routes[batch]):
+                batch, other = other, batch
+            added, _ = self.insert(batch_routes[batch], batch_routes[other])
+            saving = batch_costs[other] - added
+            if saving > 0:
+                heapq.heappush(
+                    heap, (-saving, batch, other, versions[batch], versions[other])
+                )
+
+        for batch in range(len(routes)):
+            for neighbour in self._nearest(anchors, batch):
+                if neighbour not in partners[batch]:
+                    pair(batch, neighbour)
+
+        while heap:
+            _, batch, other, version, other_version = heapq.heappop(heap)
+            if versions.get(batch) != version or versions.get(other) != other_version:
+                continue
+            added, route = self.insert(batch_routes[batch], batch_routes[other])
+            batch_routes[batch] = route
+            batch_costs[batch] += added
+            loads[batch] += loads.pop(other)
+            members[batch].extend(members.pop(other))
+            inside = members[batch]
+            owner[inside] = batch
+            owner_loads[inside] = loads[batch]
+            owner_orders[inside] = len(inside)
+            del batch_routes[other], batch_costs[other], versions[other]
+            versions[batch] += 1
+
+            previous = (partners[batch] | partners.pop(other)) - {batch, other}
+            for partner in previous:
+                partners[partner].discard(batch)
+                partners[partner].discard(other)
+            partners[batch] = set()
+            for candidate in previous | nearby(batch):
+                pair(batch, candidate)
+            for partner in previous:
+                if not partners[partner]:
+                    for candidate in nearby(partner):
+                        pair(partner, candidate)
+
+        return [members[batch] for batch in sorted(members)]
+
+    def batch_cost(self, orders, batch):
+        route = []
+        for order_id in batch:
+            _, route = self.insert(route, self._locations(orders[order_id]))
+        return self.route_cost(route)
+
+    def simulate_batch(self, orders, batch):
+        # Walks all items of the batch as one tour in insertion route order.
+        # Returns the simulate_order tuple plus the items in visiting order
+        route = []
+        items = []
+        for order_id in batch:
+            items.extend(orders[order_id])
+            _, route = self.insert(route, self._locations(orders[order_id]))
+        position = {location: index for index, location in enumerate(route)}
+        point_index = self.warehouse._point_index
+        items.sort(
+            key=lambda item: position[point_index[self.warehouse.item_locations[item]]]
+        )
+        path, distances, total_distance = self.warehouse.simulate_order(items)
+        return path, distances, total_distance, items
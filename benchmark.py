@@ -0,0 +1,218 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from layout_generator import (
+    default_depot,
+    generate_layout_for_size,
+    random_item_locations,
+    random_orders,
+)
+from simulation import Warehouse
+
+# Metrics where a larger value is better, all others are costs
+THROUGHPUT_METRICS = {"orders_per_second", "cache_hit_rate"}
+# Smallest change of a cost metric that counts as a regression, by suffix,
+# so noise on tiny values does not fail a run
+ABSOLUTE_FLOORS = {"_ms": 0.1, "_seconds": 0.01, "_mb": 1.0}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def build_warehouse(cells, items, seed, corridors=False):
+    layout = generate_layout_for_size(cells)
+    start, printer = default_depot(layout)
+    warehouse = Warehouse(layout)
+    warehouse.set_start(start)
+    warehouse.set_printer(printer)
+    item_locations = random_item_locations(
+        layout, items, random.Random(seed), exclude=(start, printer)
+    )
+    for item, location in item_locations.items():
+        warehouse.add_item_location(item, location)
+    if corridors:
+        warehouse.enable_corridors()
+    return warehouse
+
+
+def benchmark_size(cells, items=200, queries=200, orders=1000, seed=0, corridors=False):
+    rng = random.Random(seed)
+    warehouse = build_warehouse(cells, items, seed)
+    result = {
+        "rows": len(warehouse.layout),
+        "cols": len(warehouse.layout[0]),
+    }
+
+    started = time.perf_counter()
+    warehouse.compile_layout()
+    result["compile_seconds"] = time.perf_counter() - started
+    if corridors:
+        started = time.perf_counter()
+        warehouse.enable_corridors()
+        result["contract_seconds"] = time.perf_counter() - started
+
+    # Cold pathfinding latency between random pick points
+    locations = list(warehouse.item_locations.values())
+    latencies = []
+    for _ in range(queries):
+        start, end = rng.choice(locations), rng.choice(locations)
+        warehouse.path_cache.clear()
+        started = time.perf_counter()
+        warehouse.find_path(start, end)
+        latencies.append(time.perf_counter() - started)
+    result["find_path_p50_ms"] = percentile(latencies, 0.5) * 1000
+    result["find_path_p90_ms"] = percentile(latencies, 0.9) * 1000
+    result["find_path_p99_ms"] = percentile(latencies, 0.99) * 1000
+
+    # Order throughput starting from an empty path cache
+    warehouse.path_cache.clear()
+    warehouse.path_cache.reset_stats()
+    order_stream = list(
+        random_orders(warehouse.item_locations, orders, random.Random(seed))
+    )
+    started = time.perf_counter()
+    for order in order_stream:
+        warehouse.simulate_order(order)
+    elapsed = time.perf_counter() - started
+    result["orders_per_second"] = orders / elapsed if elapsed else 0.0
+    stats = warehouse.path_cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    result["cache_hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+
+    # Peak memory of a fresh warehouse answering the same queries, measured
+    # separately because tracemalloc slows down everything it traces
+    tracemalloc.start()
+    warehouse = build_warehouse(cells, items, seed, corridors)
+    for order in order_stream[: max(orders // 10, 1)]:
+        warehouse.simulate_order(order)
+    result["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return result
+
+
+def mismatched_parameters(parameters, baseline):
+    # Names of the run parameters that differ from the baseline run
+    reference = baseline.get("parameters", {})
+    return sorted(
+        name
+        for name in set(parameters) | set(reference)
+        if parameters.get(name) != reference.get(name)
+    )
+
+
+def absolute_floor(metric):
+    for suffix, floor in ABSOLUTE_FLOORS.items():
+        if metric.endswith(suffix):
+            return floor
+    return 0.0
+
+
+def compare(results, baseline, tolerance):
+    # Returns a list of human readable regressions against a baseline run.
+    # Runs with different parameters measure different things and are not
+    # compared at all
+    mismatched = mismatched_parameters(results["parameters"], baseline)
+    if mismatched:
+        raise ValueError(
+            "Baseline was run with different parameters: " + ", ".join(mismatched)
+        )
+
+    regressions = []
+    for size, metrics in results["sizes"].items():
+        for metric, value in metrics.items():
+            reference = baseline.get("sizes", {}).get(size, {}).get(metric)
+            if not reference or metric in ("rows", "cols"):
+                continue
+            if metric in THROUGHPUT_METRICS:
+                regressed = value < reference * (1 - tolerance)
+            else:
+                regressed = (
+                    value > reference * (1 + tolerance)
+                    and value - reference > absolute_floor(metric)
+                )
+            if regressed:
+                regressions.append(
+                    f"{size} cells: {metric} {value:.4g} vs baseline {reference:.4g}"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pathfinding and orders")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10**3, 10**4, 10**5, 10**6],
+        help="approximate layout sizes in cells",
+    )
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--corridors",
+        action="store_true",
+        help="answer queries on the contracted corridor graph",
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "parameters": {
+            "items": args.items,
+            "queries": args.queries,
+            "orders": args.orders,
+            "seed": args.seed,
+            "corridors": args.corridors,
+        },
+        "sizes": {},
+    }
+    if args.baseline:
+        # Refuse before spending the time on a run that cannot be compared
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        mismatched = mismatched_parameters(results["parameters"], baseline)
+        if mismatched:
+            parser.error(
+                "Baseline was run with different parameters: " + ", ".join(mismatched)
+            )
+    for cells in args.sizes:
+        metrics = benchmark_size(
+            cells, args.items, args.queries, args.orders, args.seed, args.corridors
+        )
+        results["sizes"][str(cells)] = metrics
+        print(
+            f"{cells:>8} cells: p50 {metrics['find_path_p50_ms']:.2f}ms "
+            f"p99 {metrics['find_path_p99_ms']:.2f}ms "
+            f"{metrics['orders_per_second']:.0f} orders/s "
+            f"hit rate {metrics['cache_hit_rate']:.2f} "
+            f"peak {metrics['peak_memory_mb']:.1f}MB",
+            file=sys.stderr,
+        )
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+import heapq
+from array import array
+
+INFINITY = float("inf")
+
+
+def _dijkstra(offsets, targets, weights, source):
+    # Distances from source over a weighted CSR graph, -1 where unreachable
+    distances = [-1] * (len(offsets) - 1)
+    distances[source] = 0
+    heap = [(0, source)]
+    while heap:
+        cost, node = heapq.heappop(heap)
+        if cost > distances[node]:
+            continue
+        for index in range(offsets[node], offsets[node + 1]):
+            next_node = targets[index]
+            new_cost = cost + weights[index]
+            if distances[next_node] < 0 or new_cost < distances[next_node]:
+                distances[next_node] = new_cost
+                heapq.heappush(heap, (new_cost, next_node))
+    return distances
+
+
+def _csr(edges, nodes):
+    # edges[node] maps target -> (weight, payload); returns the CSR arrays
+    offsets = array("i", [0])
+    targets = array("i")
+    weights = array("i")
+    payloads = array("i")
+    for node in range(nodes):
+        for target, (weight, payload) in sorted(edges[node].items()):
+            targets.append(target)
+            weights.append(weight)
+            payloads.append(payload)
+        offsets.append(len(targets))
+    return offsets, targets, weights, payloads
+
+
+class CorridorGraph:
+    # Contracts every corridor, a run of cells with exactly one way in and
+    # one way out, into one weighted edge between junction cells. Queries
+    # run on the junction graph, with landmark (ALT) lower bounds when
+    # landmarks > 0, and corridors are only walked again when a cell path
+    # is asked for. Distances are the same as Warehouse.find_path
+    def __init__(self, warehouse, landmarks=0):
+        if warehouse._offsets is None:
+            warehouse.compile_layout()
+        cols = warehouse._cols
+        nodes = warehouse._rows * cols
+        self._cols = cols
+        self.landmark_count = landmarks
+
+        self._out_degree = array("i", bytes(4 * nodes))
+        self._in_degree = array("i", bytes(4 * nodes))
+        self._next_node = array("i", [-1]) * nodes
+        self._previous_node = array("i", [-1]) * nodes
+        offsets = warehouse._offsets
+        targets = warehouse._targets
+        for node in range(nodes):
+            for index in range(offsets[node], offsets[node + 1]):
+                target = targets[index]
+                # Self-loops are unused slots, see Warehouse.block_cell()
+                if target != node:
+                    self._out_degree[node] += 1
+                    self._in_degree[target] += 1
+                    self._next_node[node] = target
+                    self._previous_node[target] = node
+
+        self._junction_index = array("i", [-1]) * nodes
+        self._junctions = []
+        self._live_junctions = 0
+        # Corridor cells know their chain and their position on it, the
+        # head junction is position 0
+        self._chain_of = array("i", [-1]) * nodes
+        self._position = array("i", bytes(4 * nodes))
+        self._chain_heads = []
+        self._chain_tails = []
+        self._chain_lengths = []
+        self._chain_firsts = []
+        # Per junction: target junction -> (length, first cell) and the
+        # chains leaving it
+        self._edges = []
+        self._junction_chains = []
+
+        for node in range(nodes):
+            if self._is_junction(node):
+                self._add_junction(node)
+        for junction in list(self._junctions):
+            self._contract(warehouse, junction)
+        self._promote_loops(warehouse, range(nodes))
+        self._select_landmarks(landmarks)
+
+    def _set_degrees(self, warehouse, node):
+        # Recounts the links of one cell after its edges changed
+        successors = [
+            target for target in warehouse._successors(node) if target != node
+        ]
+        predecessors = warehouse._predecessors(node)
+        self._out_degree[node] = len(successors)
+        self._in_degree[node] = len(predecessors)
+        self._next_node[node] = successors[-1] if successors else -1
+        self._previous_node[node] = predecessors[-1] if predecessors else -1
+
+    def _is_junction(self, node):
+        out_degree = self._out_degree[node]
+        in_degree = self._in_degree[node]
+        return bool(out_degree or in_degree) and not (
+            out_degree == 1 and in_degree == 1
+        )
+
+    def _add_junction(self, node):
+        self._junction_index[node] = len(self._junctions)
+        self._junctions.append(node)
+        self._edges.append({})
+        self._junction_chains.append([])
+        self._live_junctions += 1
+
+    def _contract(self, warehouse, junction):
+        offsets = warehouse._offsets
+        targets = warehouse._targets
+        junction_index = self._junction_index
+        next_node = self._next_node
+        junction_edges = self._edges[junction_index[junction]]
+        for index in range(offsets[junction], offsets[junction + 1]):
+            first = targets[index]
+            if first == junction:
+                continue
+            chain = len(self._chain_heads)
+            node = first
+            length = 1
+            while junction_index[node] < 0:
+                self._chain_of[node] = chain
+                self._position[node] = length
+                node = next_node[node]
+                length += 1
+            self._chain_heads.append(junction)
+            self._chain_tails.append(node)
+            self._chain_lengths.append(length)
+            self._chain_firsts.append(first)
+            self._junction_chains[junction_index[junction]].append(chain)
+            # Parallel corridors collapse into the shortest one
+            tail = junction_index[node]
+            best = junction_edges.get(tail)
+            if best is None or length < best[0]:
+                junction_edges[tail] = (length, first)
+
+    def _promote_loops(self, warehouse, nodes):
+        # Closed loops without any junction get one of their cells promoted
+        for node in nodes:
+            if (
+                self._out_degree[node] == 1
+                and self._in_degree[node] == 1
+                and self._chain_of[node] < 0
+                and self._junction_index[node] < 0
+            ):
+                self._add_junction(node)
+                self._contract(warehouse, node)
+
+    def update(self, warehouse, nodes):
+        # Follows a change of the edges leaving nodes, see
+        # Warehouse._change_cells(). Only the corridors through or next to
+        # nodes are contracted again. Landmark distances cannot be patched
+        # locally, with landmarks the graph is built from scratch
+        if self.landmark_count:
+            self.__init__(warehouse, self.landmark_count)
+            return
+        cols = self._cols
+        rows = len(self._next_node) // cols
+        junction_index = self._junction_index
+        chain_of = self._chain_of
+
+        # Junctions whose corridors may run through, start or end at nodes
+        affected = set()
+        for node in nodes:
+            row, col = divmod(node, cols)
+            for delta_row, delta_col in ((0, 0), (-1, 0), (1, 0), (0, -1), (0, 1)):
+                if 0 <= row + delta_row < rows and 0 <= col + delta_col < cols:
+                    other = node + delta_row * cols + delta_col
+                    if junction_index[other] >= 0:
+                        affected.add(other)
+                    elif chain_of[other] >= 0:
+                        affected.add(self._chain_heads[chain_of[other]])
+
+        # Forget their corridors, walking them on the old links
+        released = []
+        for junction in affected:
+            index = junction_index[junction]
+            for chain in self._junction_chains[index]:
+                node = self._chain_firsts[chain]
+                while junction_index[node] < 0 and chain_of[node] == chain:
+                    chain_of[node] = -1
+                    released.append(node)
+                    node = self._next_node[node]
+            self._junction_chains[index] = []
+            self._edges[index] = {}
+
+        for node in nodes:
+            self._set_degrees(warehouse, node)
+            index = junction_index[node]
+            if self._is_junction(node):
+                if index < 0:
+                    self._add_junction(node)
+                    affected.add(node)
+            elif index >= 0:
+                # Its incoming corridors end at affected junctions
+                junction_index[node] = -1
+                self._junctions[index] = -1
+                self._edges[index] = {}
+                self._junction_chains[index] = []
+                self._live_junctions -= 1
+                affected.discard(node)
+
+        for junction in affected:
+            self._contract(warehouse, junction)
+        self._promote_loops(warehouse, list(nodes) + released)
+
+    def __len__(self):
+        # Number of junctions in the contracted graph
+        return self._live_junctions
+
+    def _select_landmarks(self, count):
+        # Farthest point selection: every new landmark is the junction
+        # farthest from the ones chosen so far
+        self._landmarks_from = []
+        self._landmarks_to = []
+        edges = self._edges
+        if not edges or not count:
+            return
+        reverse = [{} for _ in edges]
+        for junction, junction_edges in enumerate(edges):
+            for target, (weight, _) in junction_edges.items():
+                reverse[target][junction] = (weight, 0)
+        edge_offsets, edge_targets, edge_weights, _ = _csr(edges, len(edges))
+        reverse_offsets, reverse_targets, reverse_weights, _ = _csr(reverse, len(edges))
+
+        spread = _dijkstra(edge_offsets, edge_targets, edge_weights, 0)
+        for _ in range(min(count, len(edges))):
+            landmark = max(range(len(spread)), key=spread.__getitem__)
+            if spread[landmark] <= 0 and self._landmarks_from:
+                break
+            self._landmarks_from.append(
+                _dijkstra(edge_offsets, edge_targets, edge_weights, landmark)
+            )
+            self._landmarks_to.append(
+                _dijkstra(reverse_offsets, reverse_targets, reverse_weights, landmark)
+            )
+            spread = [
+                min(old, new) if new >= 0 else old
+                for old, new in zip(spread, self._landmarks_from[-1])
+            ]
+            spread[landmark] = 0
+
+    def _heuristic(self, source, goal, active=2):
+        # Lower bound on the distance to goal by the triangle inequality.
+        # Only the active landmarks with the best bound at the source are
+        # used, evaluating all of them costs more than it saves
+        bounds = []
+        for from_landmark, to_landmark in zip(self._landmarks_from, self._landmarks_to):
+            bound = (from_landmark, from_landmark[goal], to_landmark, to_landmark[goal])
+            bounds.append((self._bound(source, *bound), bound))
+        bounds.sort(key=lambda item: item[0], reverse=True)
+        bounds = [bound for value, bound in bounds[:active] if value > 0]
+        if not bounds:
+            return None
+
+        def heuristic(junction):
+            best = 0
+            for bound in bounds:
+                value = self._bound(junction, *bound)
+                if value > best:
+                    best = value
+            return best
+
+        return heuristic
+
+    @staticmethod
+    def _bound(junction, from_landmark, from_goal, to_landmark, to_goal):
+        best = 0
+        from_junction = from_landmark[junction]
+        if from_goal >= 0 and from_junction >= 0 and from_goal - from_junction > best:
+            best = from_goal - from_junction
+        to_junction = to_landmark[junction]
+        if to_goal >= 0 and to_junction >= 0 and to_junction - to_goal > best:
+            best = to_junction - to_goal
+        return best
+
+    def _solve(self, start_node, end_node):
+        # Returns (distance, parents, source, goal). parents maps a junction
+        # to (previous junction, first cell of the corridor) and is None
+        # when no junction
+        # graph search was needed. distance is None if end is unreachable
+        if start_node == end_node:
+            return 0, None, None, None
+        junction_index = self._junction_index
+        chain_of = self._chain_of
+        position = self._position
+
+        source = junction_index[start_node]
+        source_cost = 0
+        if source < 0:
+            chain = chain_of[start_node]
+            if chain < 0:
+                return None, None, None, None
+            if (
+                chain_of[end_node] == chain
+                and position[end_node] > position[start_node]
+            ):
+                # end is further down the same corridor
+                return position[end_node] - position[start_node], None, None, None
+            source = junction_index[self._chain_tails[chain]]
+            source_cost = self._chain_lengths[chain] - position[start_node]
+
+        goal = junction_index[end_node]
+        goal_cost = 0
+        if goal < 0:
+            chain = chain_of[end_node]
+            if chain < 0:
+                return None, None, None, None
+            goal = junction_index[self._chain_heads[chain]]
+            goal_cost = position[end_node]
+
+        edges = self._edges
+        heuristic = self._heuristic(source, goal)
+        costs = {source: source_cost}
+        parents = {source: None}
+        closed = set()
+        open_set = [
+            (source_cost + (heuristic(source) if heuristic else 0), source_cost, source)
+        ]
+        while open_set:
+            _, cost, junction = heapq.heappop(open_set)
+            if junction == goal:
+                return cost + goal_cost, parents, source, goal
+            if junction in closed:
+                continue
+            closed.add(junction)
+            for next_junction, (weight, first) in edges[junction].items():
+                new_cost = cost + weight
+                if new_cost < costs.get(next_junction, INFINITY):
+                    costs[next_junction] = new_cost
+                    parents[next_junction] = (junction, first)
+                    heapq.heappush(
+                        open_set,
+                        (
+                            new_cost + (heuristic(next_junction) if heuristic else 0),
+                            new_cost,
+                            next_junction,
+                        ),
+                    )
+        return None, None, None, None
+
+    def distance(self, start, end):
+        # Shortest path length without unpacking the cells, None if end is
+        # unreachable from start
+        cols = self._cols
+        distance, _, _, _ = self._solve(
+            start[0] * cols + start[1], end[0] * cols + end[1]
+        )
+        return distance
+
+    def find_path(self, start, end):
+        # Shortest path as a list of cells, [] if end is unreachable
+        cols = self._cols
+        start_node = start[0] * cols + start[1]
+        end_node = end[0] * cols + end[1]
+        distance, parents, source, goal = self._solve(start_node, end_node)
+        if distance is None:
+            return []
+
+        next_node = self._next_node
+        nodes = [start_node]
+        if parents is None:
+            # Same cell or further down the same corridor
+            while nodes[-1] != end_node:
+                nodes.append(next_node[nodes[-1]])
+            return [divmod(node, cols) for node in nodes]
+
+        junctions = self._junctions
+        # Corridor cells from the start to the first junction
+        node = start_node
+        while node != junctions[source]:
+            node = next_node[node]
+            nodes.append(node)
+
+        segments = []
+        junction = goal
+        while parents[junction] is not None:
+            previous, node = parents[junction]
+            segment = [node]
+            while node != junctions[junction]:
+                node = next_node[node]
+                segment.append(node)
+            segments.append(segment)
+            junction = previous
+        for segment in reversed(segments):
+            nodes.extend(segment)
+
+        # Corridor cells from the last junction to the end
+        suffix = []
+        node = end_node
+        while node != junctions[goal]:
+            suffix.append(node)
+            node = self._previous_node[node]
+        nodes.extend(reversed(suffix))
+        return [divmod(node, cols) for node in nodes]
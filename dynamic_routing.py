@@ -0,0 +1,113 @@
+import heapq
+
+INFINITY = float("inf")
+
+
+class LifelongPlanner:
+    # Lifelong Planning A* (Koenig and Likhachev) between two cells of a
+    # warehouse. After edges change only the vertices whose distance is
+    # affected are re-expanded, instead of searching from scratch. The
+    # planner reads the warehouse adjacency on every call, so it follows
+    # in-place edits as well as recompiled layouts
+    def __init__(self, warehouse, start, end):
+        if warehouse._offsets is None:
+            warehouse.compile_layout()
+        self.warehouse = warehouse
+        self.start = start
+        self.end = end
+        cols = warehouse._cols
+        self._cols = cols
+        self._start_node = start[0] * cols + start[1]
+        self._end_node = end[0] * cols + end[1]
+        self._g = {}
+        self._rhs = {self._start_node: 0}
+        self._queue = []
+        self._queued = {}
+        self._push(self._start_node)
+        self.compute()
+
+    def _heuristic(self, node):
+        row, col = divmod(node, self._cols)
+        return abs(row - self.end[0]) + abs(col - self.end[1])
+
+    def _key(self, node):
+        best = min(self._g.get(node, INFINITY), self._rhs.get(node, INFINITY))
+        return (best + self._heuristic(node), best)
+
+    def _push(self, node):
+        key = self._key(node)
+        self._queued[node] = key
+        heapq.heappush(self._queue, (key, node))
+
+    def _successors(self, node):
+        warehouse = self.warehouse
+        targets = warehouse._targets
+        for index in range(warehouse._offsets[node], warehouse._offsets[node + 1]):
+            if targets[index] != node:
+                yield targets[index]
+
+    def _predecessors(self, node):
+        return self.warehouse._predecessors(node)
+
+    def update_vertex(self, node):
+        if node != self._start_node:
+            g = self._g
+            self._rhs[node] = min(
+                (g.get(other, INFINITY) + 1 for other in self._predecessors(node)),
+                default=INFINITY,
+            )
+        self._queued.pop(node, None)
+        if self._g.get(node, INFINITY) != self._rhs.get(node, INFINITY):
+            self._push(node)
+
+    def compute(self):
+        g = self._g
+        rhs = self._rhs
+        end = self._end_node
+        queue = self._queue
+        queued = self._queued
+        while queue:
+            key, node = queue[0]
+            if queued.get(node) != key:
+                # Stale entry
+                heapq.heappop(queue)
+                continue
+            if key >= self._key(end) and rhs.get(end, INFINITY) == g.get(end, INFINITY):
+                break
+            heapq.heappop(queue)
+            del queued[node]
+            if g.get(node, INFINITY) > rhs.get(node, INFINITY):
+                g[node] = rhs[node]
+                for successor in self._successors(node):
+                    self.update_vertex(successor)
+            else:
+                g[node] = INFINITY
+                self.update_vertex(node)
+                for successor in self._successors(node):
+                    self.update_vertex(successor)
+
+    def edges_changed(self, nodes):
+        # nodes are the heads of every added or removed edge
+        for node in nodes:
+            self.update_vertex(node)
+        self.compute()
+
+    def distance(self):
+        distance = self._g.get(self._end_node, INFINITY)
+        return None if distance == INFINITY else distance
+
+    def path(self):
+        # Walks back from the end along predecessors that are one step
+        # closer to the start
+        g = self._g
+        node = self._end_node
+        if g.get(node, INFINITY) == INFINITY:
+            return []
+        nodes = [node]
+        while node != self._start_node:
+            node = min(
+                self._predecessors(node), key=lambda other: g.get(other, INFINITY)
+            )
+            nodes.append(node)
+        nodes.reverse()
+        return [divmod(node, self._cols) for node in nodes]
@@ -0,0 +1,192 @@
+import json
+import time
+from bisect import bisect_left
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+INSTRUMENTED_METHODS = ("find_path", "get_path", "simulate_order")
+
+COUNTERS = (
+    "nodes_expanded",
+    "heap_pushes",
+    "heap_pops",
+    "cache_hits",
+    "cache_misses",
+)
+
+
+class WarehouseStats:
+    # Opt-in counters and latency histograms for a Warehouse. attach()
+    # shadows the instrumented methods with wrappers on the instance, so a
+    # warehouse without stats runs exactly the same code as before
+    def __init__(self):
+        self._hooks = []
+        self._histograms = {
+            method: [0] * (len(LATENCY_BUCKETS) + 1) for method in INSTRUMENTED_METHODS
+        }
+        self._sums = {method: 0.0 for method in INSTRUMENTED_METHODS}
+        self.reset()
+
+    def reset(self):
+        for counter in COUNTERS:
+            setattr(self, counter, 0)
+        self.peak_open_set = 0
+        # Zeroed in place, the wrappers of attached warehouses keep
+        # references to the histograms and sums
+        for histogram in self._histograms.values():
+            histogram[:] = [0] * len(histogram)
+        for method in self._sums:
+            self._sums[method] = 0.0
+        self._search_pushes = 0
+        self._search_open_set = None
+
+    def add_hook(self, hook):
+        # hook(method, args) is called before every instrumented call and may
+        # return a callable that receives the call duration afterwards, for
+        # example to start a profiler and keep its output for slow queries
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def attach(self, warehouse):
+        for method in INSTRUMENTED_METHODS:
+            bound = getattr(type(warehouse), method).__get__(warehouse)
+            setattr(warehouse, method, self._timed(method, bound))
+        warehouse.find_path = self._find_path(warehouse, warehouse.find_path)
+        warehouse._add_to_queue = self._add_to_queue(
+            type(warehouse)._add_to_queue.__get__(warehouse)
+        )
+        warehouse.stats = self
+
+    def detach(self, warehouse):
+        for method in INSTRUMENTED_METHODS + ("_add_to_queue",):
+            warehouse.__dict__.pop(method, None)
+        warehouse.stats = None
+
+    def _timed(self, method, function):
+        histogram = self._histograms[method]
+        sums = self._sums
+
+        def timed(*args):
+            done = [hook(method, args) for hook in self._hooks]
+            started = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                duration = time.perf_counter() - started
+                histogram[bisect_left(LATENCY_BUCKETS, duration)] += 1
+                sums[method] += duration
+                for callback in done:
+                    if callback is not None:
+                        callback(duration)
+
+        return timed
+
+    def _find_path(self, warehouse, timed):
+        def find_path(start, end):
+            if (start, end) in warehouse.path_cache:
+                self.cache_hits += 1
+                return timed(start, end)
+            self.cache_misses += 1
+            self._search_pushes = 0
+            self._search_open_set = None
+            path = timed(start, end)
+            if self._search_open_set is not None:
+                # Every push except the ones still queued was popped, plus
+                # the start node
+                self.heap_pushes += 1
+                self.heap_pops += 1 + self._search_pushes - len(self._search_open_set)
+                self._search_open_set = None
+            elif (
+                start == end
+                and warehouse.corridors is None
+                and warehouse.point_path_nodes(start, end) is None
+            ):
+                # A* popped its start node and stopped. Paths from the point
+                # trees or the corridor graph touch no heap
+                self.heap_pushes += 1
+                self.heap_pops += 1
+            return path
+
+        return find_path
+
+    def _add_to_queue(self, add_to_queue):
+        def counted(node, cost, open_set, costs, parents, end):
+            before = len(open_set)
+            add_to_queue(node, cost, open_set, costs, parents, end)
+            size = len(open_set)
+            self.nodes_expanded += 1
+            self.heap_pushes += size - before
+            self._search_pushes += size - before
+            self._search_open_set = open_set
+            if size > self.peak_open_set:
+                self.peak_open_set = size
+
+        return counted
+
+    def snapshot(self):
+        snapshot = {counter: getattr(self, counter) for counter in COUNTERS}
+        snapshot["peak_open_set"] = self.peak_open_set
+        snapshot["latency"] = {
+            method: {
+                "count": sum(self._histograms[method]),
+                "sum": self._sums[method],
+                "buckets": dict(
+                    zip(
+                        [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"],
+                        self._histograms[method],
+                    )
+                ),
+            }
+            for method in INSTRUMENTED_METHODS
+        }
+        return snapshot
+
+    def to_json(self):
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self, prefix="warehouse"):
+        lines = []
+        for counter in COUNTERS:
+            lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            lines.append(f"{prefix}_{counter}_total {getattr(self, counter)}")
+        lines.append(f"# TYPE {prefix}_peak_open_set gauge")
+        lines.append(f"{prefix}_peak_open_set {self.peak_open_set}")
+
+        name = f"{prefix}_call_duration_seconds"
+        lines.append(f"# TYPE {name} histogram")
+        for method in INSTRUMENTED_METHODS:
+            cumulative = 0
+            histogram = self._histograms[method]
+            for bound, count in zip(LATENCY_BUCKETS, histogram):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{{method="{method}",le="{bound}"}} {cumulative}'
+                )
+            cumulative += histogram[-1]
+            lines.append(f'{name}_bucket{{method="{method}",le="+Inf"}} {cumulative}')
+            lines.append(f'{name}_sum{{method="{method}"}} {self._sums[method]}')
+            lines.append(f'{name}_count{{method="{method}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,179 @@
+import argparse
+import mmap
+import struct
+
+from simulation import Warehouse, load_layout
+
+# File layout, all integers little endian:
+#   header    MAGIC, version, flags, rows, cols, edge count
+#   symbols   SYMBOL_COUNT fixed width UTF-8 names, the spelling used in the
+#             source layout for every cell bitmask
+#   cells     one bitmask byte per cell, row major
+#   adjacency optional, padded to 4 bytes: rows * cols + 1 int32 offsets
+#             followed by edge count int32 targets, the CSR arrays that
+#             Warehouse.compile_layout() would build
+MAGIC = b"WHLAYOUT"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIII")
+FLAG_ADJACENCY = 1
+
+DIRECTION_BITS = {"^": 1, "v": 2, "<": 4, ">": 8}
+RACK = 16
+SYMBOL_COUNT = 32
+SYMBOL_WIDTH = 8
+
+
+def cell_bitmask(cell):
+    if cell == "X":
+        return RACK
+    mask = 0
+    for direction in cell:
+        mask |= DIRECTION_BITS.get(direction, 0)
+    return mask
+
+
+def write_compiled_layout(layout, filename, adjacency=True):
+    rows = len(layout)
+    cols = len(layout[0])
+    symbols = [""] * SYMBOL_COUNT
+    symbols[RACK] = "X"
+    # Default spellings for masks that do not occur in the layout
+    for mask in range(1, RACK):
+        symbols[mask] = "".join(
+            direction for direction, bit in DIRECTION_BITS.items() if mask & bit
+        )
+    seen = set()
+    cells = bytearray(rows * cols)
+    for row in range(rows):
+        for col in range(cols):
+            cell = layout[row][col]
+            mask = cell_bitmask(cell)
+            cells[row * cols + col] = mask
+            if mask not in seen:
+                seen.add(mask)
+                symbols[mask] = cell
+
+    offsets = targets = None
+    if adjacency:
+        warehouse = Warehouse(layout)
+        warehouse.compile_layout()
+        offsets = warehouse._offsets
+        targets = warehouse._targets
+
+    with open(filename, "wb") as layout_file:
+        layout_file.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                FLAG_ADJACENCY if adjacency else 0,
+                rows,
+                cols,
+                len(targets) if adjacency else 0,
+            )
+        )
+        for symbol in symbols:
+            encoded = symbol.encode()
+            if len(encoded) > SYMBOL_WIDTH:
+                raise ValueError(f"Cell {symbol!r} is too long")
+            layout_file.write(encoded.ljust(SYMBOL_WIDTH, b"\0"))
+        layout_file.write(cells)
+        if adjacency:
+            layout_file.write(b"\0" * (-layout_file.tell() % 4))
+            layout_file.write(offsets.tobytes())
+            layout_file.write(targets.tobytes())
+
+
+class MappedLayoutRow:
+    def __init__(self, layout, row):
+        self._layout = layout
+        self._start = row * layout.cols
+
+    def __len__(self):
+        return self._layout.cols
+
+    def __getitem__(self, col):
+        if not 0 <= col < self._layout.cols:
+            raise IndexError(col)
+        return self._layout.symbols[self._layout.cells[self._start + col]]
+
+    def __iter__(self):
+        symbols = self._layout.symbols
+        cells = self._layout.cells
+        for index in range(self._start, self._start + self._layout.cols):
+            yield symbols[cells[index]]
+
+
+class MappedLayout:
+    # Read-only memory-mapped compiled layout. Behaves like the nested list
+    # layout Warehouse expects, so many worker processes can share one copy
+    # of a large floor through the page cache
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as layout_file:
+            self._mmap = mmap.mmap(layout_file.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+
+        magic, version, flags, rows, cols, edges = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{filename} is not a compiled layout")
+        self.rows = rows
+        self.cols = cols
+
+        position = HEADER.size
+        self.symbols = [
+            bytes(buffer[start : start + SYMBOL_WIDTH]).rstrip(b"\0").decode()
+            for start in range(
+                position, position + SYMBOL_COUNT * SYMBOL_WIDTH, SYMBOL_WIDTH
+            )
+        ]
+        position += SYMBOL_COUNT * SYMBOL_WIDTH
+        self.cells = buffer[position : position + rows * cols]
+        position += rows * cols
+
+        self.offsets = self.targets = None
+        if flags & FLAG_ADJACENCY:
+            position += -position % 4
+            offsets_end = position + 4 * (rows * cols + 1)
+            self.offsets = buffer[position:offsets_end].cast("i")
+            self.targets = buffer[offsets_end : offsets_end + 4 * edges].cast("i")
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.rows:
+            raise IndexError(row)
+        return MappedLayoutRow(self, row)
+
+    def __iter__(self):
+        for row in range(self.rows):
+            yield MappedLayoutRow(self, row)
+
+    def __getstate__(self):
+        # Worker processes map the same file instead of copying the floor
+        return {"filename": self.filename}
+
+    def __setstate__(self, state):
+        self.__init__(state["filename"])
+
+
+def open_warehouse(filename, **kwargs):
+    # Warehouse backed by a memory-mapped compiled layout
+    return Warehouse(MappedLayout(filename), **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile a CSV layout")
+    parser.add_argument("layout", help="CSV layout, e.g. warehouse_layout.csv")
+    parser.add_argument("output", help="compiled layout file")
+    parser.add_argument(
+        "--no-adjacency", action="store_true", help="only store the cells"
+    )
+    args = parser.parse_args(argv)
+    write_compiled_layout(
+        load_layout(args.layout), args.output, adjacency=not args.no_adjacency
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import csv
+import math
+import random
+
+
+def generate_layout(aisles, aisle_length, cross_aisle_spacing=30, rack_depth=2):
+    # Serpentine layout in the style of warehouse_layout.csv: one-way aisle
+    # rows with alternating direction separated by rack_depth rows of racks,
+    # a two-way spine in column 0 and one-way down cross aisles every
+    # cross_aisle_spacing columns and at the far end. The last aisle runs
+    # back towards the spine so every cell can reach every other cell, which
+    # needs an even number of aisles
+    if aisles < 2 or aisle_length < 2:
+        raise ValueError("Need at least two aisles of length two")
+    if aisles % 2:
+        raise ValueError("Need an even number of aisles")
+
+    rows = (rack_depth + 1) * (aisles - 1) + 3
+    cols = aisle_length + 1
+    cross_aisles = set(range(cross_aisle_spacing, cols - 1, cross_aisle_spacing))
+    cross_aisles.add(cols - 1)
+    aisle_rows = {1 + (rack_depth + 1) * aisle: aisle for aisle in range(aisles)}
+
+    layout = []
+    for row in range(rows):
+        if row == 0 or row == rows - 1:
+            layout.append(["X"] * cols)
+            continue
+
+        aisle = aisle_rows.get(row)
+        if aisle is None:
+            # Rack rows, only the spine and the cross aisles are walkable
+            layout.append(
+                ["^v"] + ["v" if col in cross_aisles else "X" for col in range(1, cols)]
+            )
+            continue
+
+        direction = "<" if (aisles - 1 - aisle) % 2 == 0 else ">"
+        last = aisle == aisles - 1
+        spine = ("" if aisle == 0 else "^") + ("" if last else "v")
+        if direction == ">":
+            spine = ">" + spine if aisle == 0 else spine + ">"
+        cells = [spine]
+        for col in range(1, cols):
+            if col in cross_aisles and not last:
+                cells.append(direction + "v")
+            else:
+                cells.append(direction)
+        layout.append(cells)
+    return layout
+
+
+def generate_layout_for_size(cells, cross_aisle_spacing=30, rack_depth=2):
+    # Roughly cells cells with the 1:2 aspect ratio of the original floor
+    rows = max(int(math.sqrt(cells / 2)), rack_depth + 4)
+    aisles = max((rows - 3) // (rack_depth + 1) + 1, 2)
+    aisles += aisles % 2
+    aisle_length = max(cells // ((rack_depth + 1) * (aisles - 1) + 3) - 1, 2)
+    return generate_layout(aisles, aisle_length, cross_aisle_spacing, rack_depth)
+
+
+def default_depot(layout):
+    # Start and printer next to each other on the spine, halfway down
+    middle = len(layout) // 2
+    return (middle, 0), (middle + 1, 0)
+
+
+def random_item_locations(layout, count, rng=None, exclude=()):
+    # Places count items on distinct walkable cells off the spine
+    rng = rng or random.Random(0)
+    cells = [
+        (row, col)
+        for row in range(len(layout))
+        for col in range(1, len(layout[0]))
+        if layout[row][col] != "X" and (row, col) not in exclude
+    ]
+    if count > len(cells):
+        raise ValueError(f"{count} items do not fit into {len(cells)} cells")
+    return {
+        f"Item{index + 1}": location
+        for index, location in enumerate(rng.sample(cells, count))
+    }
+
+
+def random_orders(items, count, rng=None, min_items=1, max_items=5, skew=1.0):
+    # Lazily yields count orders. Item popularity follows a Zipf like
+    # distribution with exponent skew
+    rng = rng or random.Random(0)
+    items = list(items)
+    weights = [1.0 / (rank + 1) ** skew for rank in range(len(items))]
+    for _ in range(count):
+        yield rng.choices(items, weights, k=rng.randint(min_items, max_items))
+
+
+def write_layout(layout, filename):
+    with open(filename, "w", newline="") as csvfile:
+        csv.writer(csvfile).writerows(layout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a warehouse layout")
+    parser.add_argument("output", help="CSV file for the layout")
+    parser.add_argument("--cells", type=int, default=4095)
+    parser.add_argument("--cross-aisle-spacing", type=int, default=30)
+    parser.add_argument("--rack-depth", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    layout = generate_layout_for_size(
+        args.cells, args.cross_aisle_spacing, args.rack_depth
+    )
+    write_layout(layout, args.output)
+    print(f"{len(layout)}x{len(layout[0])} layout written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from routing_client import RoutingClient
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+async def generate_load(
+    connect,
+    requests=1000,
+    connections=4,
+    concurrency=32,
+    distinct=200,
+    min_items=1,
+    max_items=5,
+    method="simulate_order",
+    seed=0,
+):
+    # Sends requests random orders drawn from distinct different ones, so
+    # repeated orders exercise request coalescing. concurrency requests are
+    # kept in flight, spread over connections connections
+    clients = [await connect() for _ in range(connections)]
+    rng = random.Random(seed)
+    items = await clients[0].items()
+    orders = [
+        rng.sample(items, min(rng.randint(min_items, max_items), len(items)))
+        for _ in range(distinct)
+    ]
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker(client):
+        nonlocal errors
+        for _ in remaining:
+            order = rng.choice(orders)
+            started = time.perf_counter()
+            try:
+                await client.call(method, items=order, include_path=False)
+            except ValueError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(worker(clients[index % connections]) for index in range(concurrency))
+    )
+    elapsed = time.perf_counter() - started
+    server_stats = await clients[0].stats()
+    for client in clients:
+        await client.close()
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.5) * 1000,
+            "p90": percentile(latencies, 0.9) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+        },
+        "server": server_stats,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test a routing service")
+    parser.add_argument("--socket", help="Unix socket path instead of TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--distinct", type=int, default=200, help="number of different orders"
+    )
+    parser.add_argument("--min-items", type=int, default=1)
+    parser.add_argument("--max-items", type=int, default=5)
+    parser.add_argument(
+        "--method",
+        default="simulate_order",
+        choices=["simulate_order", "get_path", "order_distances"],
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    def connect():
+        return RoutingClient.connect(args.socket, args.host, args.port)
+
+    results = asyncio.run(
+        generate_load(
+            connect,
+            args.requests,
+            args.connections,
+            args.concurrency,
+            args.distinct,
+            args.min_items,
+            args.max_items,
+            args.method,
+            args.seed,
+        )
+    )
+    latency = results["latency_ms"]
+    print(
+        f"{results['requests']} requests in {results['seconds']:.2f}s: "
+        f"{results['requests_per_second']:.0f} req/s, "
+        f"p50 {latency['p50']:.2f}ms p90 {latency['p90']:.2f}ms "
+        f"p99 {latency['p99']:.2f}ms, {results['errors']} errors, "
+        f"{results['server']['coalesced']} coalesced",
+        file=sys.stderr,
+    )
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
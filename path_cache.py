@@ -0,0 +1,245 @@
+from collections import OrderedDict, defaultdict
+
+# Two bits per step, four steps per byte
+STEP_CODES = {(-1, 0): 0, (1, 0): 1, (0, -1): 2, (0, 1): 3}
+CODE_STEPS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+# The four steps packed into every possible byte
+BYTE_STEPS = [
+    tuple(CODE_STEPS[(byte >> (shift * 2)) & 3] for shift in range(4))
+    for byte in range(256)
+]
+
+# Rough per entry cost of the key tuple, the entry tuple and the dict slot
+ENTRY_OVERHEAD = 200
+# Rough cost of a key in the reverse cell index, and of the set that
+# holds the keys of one cell
+INDEX_KEY_OVERHEAD = 50
+INDEX_CELL_OVERHEAD = 350
+
+
+def pack_path(path):
+    # Returns (start, steps, packed) where packed holds the moves between
+    # consecutive cells as 2 bit codes
+    packed = bytearray((len(path) + 2) // 4)
+    for index in range(1, len(path)):
+        previous = path[index - 1]
+        current = path[index]
+        code = STEP_CODES[(current[0] - previous[0], current[1] - previous[1])]
+        step = index - 1
+        packed[step >> 2] |= code << ((step & 3) * 2)
+    return path[0], len(path) - 1, bytes(packed)
+
+
+def unpack_path(start, steps, packed):
+    row, col = start
+    path = [start]
+    for byte in packed:
+        for delta_row, delta_col in BYTE_STEPS[byte]:
+            row += delta_row
+            col += delta_col
+            path.append((row, col))
+    # The last byte may hold padding steps
+    del path[steps + 1 :]
+    return path
+
+
+class PathCache:
+    # Maps (start, end) to a path stored as packed directions. Bounded by
+    # max_entries and/or max_bytes, evicting with "lru" or "lfu". Paths are
+    # only expanded to coordinates when a caller asks for them. Once
+    # index_cells() was called the reverse index counts against max_bytes
+    def __init__(self, max_entries=None, max_bytes=None, policy="lru"):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown eviction policy {policy}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries = {}
+        # LRU order, or for LFU one insertion ordered bucket per frequency
+        self._order = OrderedDict()
+        self._frequency = {}
+        self._buckets = defaultdict(OrderedDict)
+        self._min_frequency = 0
+        # Cell to keys reverse index, only kept once index_cells() was called
+        self._cells = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __getitem__(self, key):
+        path = self.get(key)
+        if path is None:
+            raise KeyError(key)
+        return path
+
+    def __setitem__(self, key, path):
+        self.put(key, path)
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._touch(key)
+        return unpack_path(*entry)
+
+    def distance(self, key):
+        # Cached path length without expanding the path, None on a miss
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touch(key)
+        return entry[1]
+
+    def put(self, key, path):
+        if key in self._entries:
+            self._remove(key)
+        entry = pack_path(path)
+        size = self._size(entry)
+        self._evict(1, size)
+        self._entries[key] = entry
+        self.bytes += size
+        if self.policy == "lru":
+            self._order[key] = None
+        else:
+            self._frequency[key] = 1
+            self._buckets[1][key] = None
+            self._min_frequency = 1
+        if self._cells is not None:
+            for cell in path:
+                self._index(cell, key)
+            # Cells new to the index may not fit any more
+            self._evict(0, 0)
+
+    def discard(self, key):
+        if key in self._entries:
+            self._remove(key)
+
+    def keys(self):
+        return self._entries.keys()
+
+    def path_lengths(self):
+        # (key, steps) of every entry, without expanding or touching it
+        return ((key, entry[1]) for key, entry in self._entries.items())
+
+    def index_cells(self):
+        # From now on keep track of the cached paths through every cell, so
+        # layout changes can drop exactly the affected paths
+        if self._cells is None:
+            self._cells = {}
+            self.bytes = 0
+            for key, entry in self._entries.items():
+                self.bytes += self._size(entry)
+                for cell in unpack_path(*entry):
+                    self._index(cell, key)
+            self._evict(0, 0)
+
+    def keys_through(self, cell):
+        self.index_cells()
+        return set(self._cells.get(cell, ()))
+
+    def clear(self):
+        self._entries.clear()
+        self._order.clear()
+        self._frequency.clear()
+        self._buckets.clear()
+        self._min_frequency = 0
+        self.bytes = 0
+        if self._cells is not None:
+            self._cells.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _touch(self, key):
+        if self.policy == "lru":
+            self._order.move_to_end(key)
+            return
+        frequency = self._frequency[key]
+        bucket = self._buckets[frequency]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[frequency]
+            if self._min_frequency == frequency:
+                self._min_frequency = frequency + 1
+        self._frequency[key] = frequency + 1
+        self._buckets[frequency + 1][key] = None
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= self._size(entry)
+        if self._cells is not None:
+            for cell in unpack_path(*entry):
+                keys = self._cells.get(cell)
+                if keys is None:
+                    # Visited twice by the path
+                    continue
+                keys.discard(key)
+                if not keys:
+                    del self._cells[cell]
+                    self.bytes -= INDEX_CELL_OVERHEAD
+        if self.policy == "lru":
+            del self._order[key]
+            return
+        frequency = self._frequency.pop(key)
+        bucket = self._buckets[frequency]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[frequency]
+            if self._min_frequency == frequency:
+                self._min_frequency = min(self._buckets, default=0)
+
+    def _size(self, entry):
+        # Bytes of an entry including its keys in the reverse index, the
+        # sets of the cells are charged by _index()
+        size = len(entry[2]) + ENTRY_OVERHEAD
+        if self._cells is not None:
+            size += (entry[1] + 1) * INDEX_KEY_OVERHEAD
+        return size
+
+    def _index(self, cell, key):
+        keys = self._cells.get(cell)
+        if keys is None:
+            keys = self._cells[cell] = set()
+            self.bytes += INDEX_CELL_OVERHEAD
+        keys.add(key)
+
+    def _victim(self):
+        if self.policy == "lru":
+            return next(iter(self._order))
+        if self._min_frequency not in self._buckets:
+            self._min_frequency = min(self._buckets)
+        return next(iter(self._buckets[self._min_frequency]))
+
+    def _evict(self, entries, size):
+        # Make room for entries more entries taking size more bytes
+        while self._entries and (
+            (
+                self.max_entries is not None
+                and len(self._entries) + entries > self.max_entries
+            )
+            or (self.max_bytes is not None and self.bytes + size > self.max_bytes)
+        ):
+            self._remove(self._victim())
+            self.evictions += 1
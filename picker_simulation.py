@@ -0,0 +1,347 @@
+import heapq
+from collections import OrderedDict, defaultdict, deque
+
+# Event actions
+RELEASE = 0
+STEP = 1
+TIMEOUT = 2
+
+
+class PickerSimulation:
+    # Discrete-event simulation of many pickers sharing the warehouse.
+    # Every walkable cell holds at most cell_capacity pickers (start and
+    # printer are unlimited), a picker that cannot enter the next cell of
+    # its route queues until the cell frees up. Pickers that wait on each
+    # other in a cycle, e.g. head-on in a two-way aisle, pass each other at
+    # once without counting as waiting. Routes are expanded from the pick
+    # point trees of the distance matrix. Times are in seconds
+    def __init__(
+        self,
+        warehouse,
+        pickers,
+        cell_capacity=1,
+        step_time=1.0,
+        pick_time=10.0,
+        print_time=20.0,
+        blocking_timeout=None,
+        optimize=False,
+        route_cache_size=4096,
+    ):
+        if not warehouse.start or not warehouse.printer:
+            raise ValueError("Start or printer location not set")
+        if warehouse._offsets is None:
+            warehouse.compile_layout()
+        # Legs are expanded through the parent trees of the pick points
+        if warehouse.parent_matrix is None or any(
+            location not in warehouse._point_index
+            for location in warehouse.pick_points()
+        ):
+            warehouse.build_distance_matrix(paths=True)
+
+        self.warehouse = warehouse
+        self.pickers = pickers
+        self.cell_capacity = cell_capacity
+        self.step_time = step_time
+        self.pick_time = pick_time
+        self.print_time = print_time
+        # Optionally let pickers that wait longer than this squeeze past
+        self.blocking_timeout = blocking_timeout
+        self.optimize = optimize
+        # Node routes of the most recent distinct orders
+        self.route_cache_size = route_cache_size
+        self._routes = OrderedDict()
+
+        cols = warehouse._cols
+        self._cols = cols
+        self._start_node = warehouse.start[0] * cols + warehouse.start[1]
+        self._printer_node = warehouse.printer[0] * cols + warehouse.printer[1]
+        self._return_path = self._leg(warehouse.printer, warehouse.start)
+        if not self._return_path:
+            raise ValueError("Path from printer to start not found")
+
+    def _leg(self, start, end):
+        # Node ids from start to end, [] if end cannot be reached
+        nodes = self.warehouse.point_path_nodes(start, end)
+        if nodes is None:
+            cols = self._cols
+            nodes = [
+                row * cols + col for row, col in self.warehouse.find_path(start, end)
+            ]
+        return nodes
+
+    def route(self, items):
+        # Node ids from start over all items to the printer and back to the
+        # start, plus the service time at each stop index. Routes are shared
+        # by equal orders and must not be modified
+        key = tuple(items)
+        cached = self._routes.get(key)
+        if cached is not None:
+            self._routes.move_to_end(key)
+            return cached
+
+        warehouse = self.warehouse
+        if self.optimize:
+            items, _ = warehouse.optimize_order(items)
+
+        nodes = [self._start_node]
+        service = {}
+        current_position = warehouse.start
+        for item in items:
+            item_location = warehouse.item_locations.get(item)
+            if not item_location:
+                raise ValueError(f"Item {item} location not found")
+            item_path = self._leg(current_position, item_location)
+            if not item_path:
+                raise ValueError(f"Path to item {item} not found")
+            nodes.extend(item_path[1:])
+            stop = len(nodes) - 1
+            service[stop] = service.get(stop, 0.0) + self.pick_time
+            current_position = item_location
+
+        printer_path = self._leg(current_position, warehouse.printer)
+        if not printer_path:
+            raise ValueError("Path to printer not found")
+        nodes.extend(printer_path[1:])
+        stop = len(nodes) - 1
+        service[stop] = service.get(stop, 0.0) + self.print_time
+        nodes.extend(self._return_path[1:])
+
+        if self.route_cache_size:
+            self._routes[key] = (nodes, service)
+            if len(self._routes) > self.route_cache_size:
+                self._routes.popitem(last=False)
+        return nodes, service
+
+    def run(self, orders, until=None):
+        # orders is an iterable of (release_time, items) sorted by release
+        # time. It is consumed lazily, one release event at a time
+        pickers = self.pickers
+        step_time = self.step_time
+        timeout = self.blocking_timeout
+        unlimited = {self._start_node, self._printer_node}
+        capacity = self.cell_capacity
+
+        # Pickers in every cell, the size of a set is the cell occupancy
+        occupants = defaultdict(set)
+        occupants[self._start_node] = set(range(pickers))
+        waiters = {}
+        routes = [None] * pickers
+        services = [None] * pickers
+        positions = [0] * pickers
+        blocked_on = [-1] * pickers
+        wait_started = [0.0] * pickers
+        wait_tokens = [0] * pickers
+        order_released = [0.0] * pickers
+        order_assigned = [0.0] * pickers
+        busy_time = [0.0] * pickers
+        wait_time = [0.0] * pickers
+        orders_done = [0] * pickers
+        idle = deque(range(pickers))
+        backlog = deque()
+        failures = []
+        lead_times = []
+        deadlocks = 0
+
+        events = []
+        sequence = 0
+        order_iterator = iter(orders)
+        released = 0
+
+        def release_next():
+            nonlocal sequence
+            for release_time, items in order_iterator:
+                heapq.heappush(events, (release_time, sequence, -1, RELEASE, items))
+                sequence += 1
+                return
+
+        def start_order(picker, items, release_time, now):
+            nonlocal sequence
+            try:
+                route, service = self.route(items)
+            except ValueError as error:
+                failures.append(str(error))
+                return False
+            routes[picker] = route
+            services[picker] = service
+            positions[picker] = 0
+            order_released[picker] = release_time
+            order_assigned[picker] = now
+            heapq.heappush(
+                events, (now + service.get(0, 0.0), sequence, picker, STEP, None)
+            )
+            sequence += 1
+            return True
+
+        def advance(picker, now):
+            # Moves picker one cell along its route, returns the cell it left
+            nonlocal sequence
+            route = routes[picker]
+            position = positions[picker]
+            current = route[position]
+            following = route[position + 1]
+            occupants[current].discard(picker)
+            occupants[following].add(picker)
+            positions[picker] = position + 1
+            heapq.heappush(
+                events,
+                (
+                    now + step_time + services[picker].get(position + 1, 0.0),
+                    sequence,
+                    picker,
+                    STEP,
+                    None,
+                ),
+            )
+            sequence += 1
+            return current
+
+        def move(picker, now):
+            nonlocal sequence
+            current = advance(picker, now)
+            queue = waiters.get(current)
+            while queue:
+                waiting = queue.popleft()
+                if blocked_on[waiting] == current:
+                    wait_time[waiting] += now - wait_started[waiting]
+                    blocked_on[waiting] = -1
+                    heapq.heappush(events, (now, sequence, waiting, STEP, None))
+                    sequence += 1
+                    break
+
+        def find_deadlock(picker, following):
+            # Pickers that close a cycle of waits back to picker: each one is
+            # blocked on a full cell held by the next. Only a new wait can
+            # close a cycle, so every cycle goes through picker
+            stack = [(following, [picker])]
+            seen = set()
+            while stack:
+                cell, cycle = stack.pop()
+                for occupant in occupants.get(cell, ()):
+                    target = blocked_on[occupant]
+                    if target == -1 or occupant in seen:
+                        continue
+                    seen.add(occupant)
+                    if picker in occupants.get(target, ()):
+                        return cycle + [occupant]
+                    stack.append((target, cycle + [occupant]))
+            return None
+
+        release_next()
+        now = 0.0
+        while events:
+            now, _, picker, action, data = heapq.heappop(events)
+            if until is not None and now > until:
+                now = until
+                break
+
+            if action == RELEASE:
+                released += 1
+                release_next()
+                if idle:
+                    candidate = idle.popleft()
+                    if not start_order(candidate, data, now, now):
+                        idle.appendleft(candidate)
+                else:
+                    backlog.append((now, data))
+                continue
+
+            if action == TIMEOUT:
+                if blocked_on[picker] != -1 and wait_tokens[picker] == data:
+                    wait_time[picker] += now - wait_started[picker]
+                    waiters[blocked_on[picker]].remove(picker)
+                    blocked_on[picker] = -1
+                    move(picker, now)
+                continue
+
+            route = routes[picker]
+            position = positions[picker]
+            if position == len(route) - 1:
+                orders_done[picker] += 1
+                busy_time[picker] += now - order_assigned[picker]
+                lead_times.append(now - order_released[picker])
+                routes[picker] = None
+                while backlog:
+                    release_time, items = backlog.popleft()
+                    if start_order(picker, items, release_time, now):
+                        break
+                else:
+                    idle.append(picker)
+                continue
+
+            following = route[position + 1]
+            if (
+                capacity is None
+                or following in unlimited
+                or len(occupants[following]) < capacity
+            ):
+                move(picker, now)
+                continue
+
+            cycle = find_deadlock(picker, following)
+            if cycle:
+                # Everybody in the cycle steps forward together, which
+                # leaves the occupancy of every cell unchanged
+                deadlocks += 1
+                for member in cycle[1:]:
+                    wait_time[member] += now - wait_started[member]
+                    waiters[blocked_on[member]].remove(member)
+                    blocked_on[member] = -1
+                for member in cycle:
+                    advance(member, now)
+            else:
+                blocked_on[picker] = following
+                wait_started[picker] = now
+                wait_tokens[picker] += 1
+                waiters.setdefault(following, deque()).append(picker)
+                if timeout is not None:
+                    heapq.heappush(
+                        events,
+                        (now + timeout, sequence, picker, TIMEOUT, wait_tokens[picker]),
+                    )
+                    sequence += 1
+
+        return self._report(
+            now,
+            released,
+            busy_time,
+            wait_time,
+            orders_done,
+            lead_times,
+            failures,
+            deadlocks,
+        )
+
+    def _report(
+        self,
+        now,
+        released,
+        busy_time,
+        wait_time,
+        orders_done,
+        lead_times,
+        failures,
+        deadlocks,
+    ):
+        completed = sum(orders_done)
+        lead_times.sort()
+        return {
+            "simulated_time": now,
+            "orders_released": released,
+            "orders_completed": completed,
+            "orders_failed": len(failures),
+            "orders_per_hour": completed * 3600.0 / now if now else 0.0,
+            "mean_lead_time": sum(lead_times) / completed if completed else 0.0,
+            "p95_lead_time": (
+                lead_times[int(0.95 * (completed - 1))] if completed else 0.0
+            ),
+            "pickers": [
+                {
+                    "utilization": busy_time[picker] / now if now else 0.0,
+                    "wait_time": wait_time[picker],
+                    "orders": orders_done[picker],
+                }
+                for picker in range(self.pickers)
+            ],
+            "deadlocks_resolved": deadlocks,
+            "failures": failures,
+        }
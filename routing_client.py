@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+
+# Same limit as the service, see routing_service.LINE_LIMIT
+LINE_LIMIT = 2**24
+
+
+class RoutingClient:
+    # asyncio client for routing_service. Requests are pipelined over one
+    # connection and matched to their responses by id
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count(1)
+        self._waiting = {}
+        self._read_task = asyncio.ensure_future(self._read())
+
+    @classmethod
+    async def connect(cls, path=None, host="127.0.0.1", port=8765):
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+        return cls(reader, writer)
+
+    async def _read(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self._waiting.pop(response.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection closed"))
+            self._waiting.clear()
+
+    async def _send(self, request):
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+        self._writer.write(json.dumps({"id": request_id, **request}).encode() + b"\n")
+        await self._writer.drain()
+        return await future
+
+    async def call(self, method, **params):
+        response = await self._send({"method": method, **params})
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response["result"]
+
+    async def batch(self, requests):
+        # One response per request, errors are returned in place
+        response = await self._send(
+            {
+                "method": "batch",
+                "requests": [
+                    {"id": index, **request} for index, request in enumerate(requests)
+                ],
+            }
+        )
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response["results"]
+
+    async def simulate_order(self, items, include_path=True):
+        return await self.call("simulate_order", items=items, include_path=include_path)
+
+    async def get_path(self, items):
+        return await self.call("get_path", items=items)
+
+    async def order_distances(self, items):
+        return await self.call("order_distances", items=items)
+
+    async def items(self):
+        return await self.call("items")
+
+    async def stats(self):
+        return await self.call("stats")
+
+    async def close(self):
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+        await self._read_task
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query a routing service")
+    parser.add_argument(
+        "method", choices=["simulate_order", "get_path", "order_distances", "stats"]
+    )
+    parser.add_argument("items", nargs="*")
+    parser.add_argument("--socket", help="Unix socket path instead of TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    async def query():
+        client = await RoutingClient.connect(args.socket, args.host, args.port)
+        try:
+            if args.method == "stats":
+                return await client.stats()
+            return await client.call(args.method, items=args.items)
+        finally:
+            await client.close()
+
+    try:
+        print(json.dumps(asyncio.run(query())))
+    except ValueError as error:
+        sys.exit(f"Error: {error}")
+
+
+if __name__ == "__main__":
+    main()
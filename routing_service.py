@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from simulation import add_warehouse_arguments, warehouse_from_args
+
+METHODS = ("simulate_order", "get_path", "order_distances")
+# Longest accepted request or response line, batches can get large
+LINE_LIMIT = 2**24
+
+
+def solve(warehouse, method, items, include_path=True):
+    if method == "simulate_order":
+        path, distances, total_distance = warehouse.simulate_order(items)
+        result = {"distances": distances, "total_distance": total_distance}
+        if include_path:
+            result["path"] = path
+        return result
+    if method == "get_path":
+        return {"path": warehouse.get_path(items)}
+    if method == "order_distances":
+        distances, total_distance = warehouse.order_distances(items)
+        return {"distances": distances, "total_distance": total_distance}
+    raise ValueError(f"Unknown method {method}")
+
+
+_worker_warehouse = None
+
+
+def _init_worker(warehouse):
+    global _worker_warehouse
+    _worker_warehouse = warehouse
+
+
+def _solve_worker(method, items, include_path):
+    return solve(_worker_warehouse, method, items, include_path)
+
+
+class RoutingService:
+    # Serves one warehouse to many clients over JSON lines. Identical
+    # requests in flight share one solve, solves run in an executor so the
+    # event loop keeps accepting, and once max_pending requests are in
+    # flight no connection reads past its next line until one of them is
+    # answered. Idle connections hold no permit
+    def __init__(self, warehouse, processes=0, max_pending=256, latency_window=10000):
+        self.warehouse = warehouse
+        if processes:
+            self._executor = ProcessPoolExecutor(
+                processes, initializer=_init_worker, initargs=(warehouse,)
+            )
+        else:
+            # Warehouse and its path cache are not thread safe, one thread
+            # keeps the solves off the event loop
+            self._executor = ThreadPoolExecutor(1)
+        self._processes = processes
+        self._pending = asyncio.Semaphore(max_pending)
+        self._in_flight = {}
+        self.started = time.monotonic()
+        self.requests = 0
+        self.solves = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._latencies = deque(maxlen=latency_window)
+
+    async def handle(self, request):
+        # Answers one decoded request, never raises for bad input
+        started = time.perf_counter()
+        self.requests += 1
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+            method = request.get("method")
+            if method == "batch":
+                requests = request.get("requests")
+                if not isinstance(requests, list):
+                    raise ValueError("Batch needs a list of requests")
+                results = await asyncio.gather(
+                    *(self.handle(batched) for batched in requests)
+                )
+                response = {"id": request_id, "results": results}
+            elif method == "stats":
+                response = {"id": request_id, "result": self.stats()}
+            elif method == "items":
+                response = {
+                    "id": request_id,
+                    "result": sorted(self.warehouse.item_locations),
+                }
+            else:
+                items = request.get("items")
+                if not isinstance(items, list):
+                    raise ValueError("Request needs a list of items")
+                result = await self._solve(
+                    method, items, bool(request.get("include_path", True))
+                )
+                response = {"id": request_id, "result": result}
+        except (ValueError, TypeError) as error:
+            self.errors += 1
+            response = {"id": request_id, "error": str(error)}
+        self._latencies.append(time.perf_counter() - started)
+        return response
+
+    async def _solve(self, method, items, include_path):
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method}")
+        key = (method, tuple(items), include_path)
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._run(method, items, include_path))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded, so a cancelled waiter does not cancel the shared solve
+        return await asyncio.shield(task)
+
+    async def _run(self, method, items, include_path):
+        self.solves += 1
+        loop = asyncio.get_running_loop()
+        if self._processes:
+            return await loop.run_in_executor(
+                self._executor, _solve_worker, method, items, include_path
+            )
+        return await loop.run_in_executor(
+            self._executor, solve, self.warehouse, method, items, include_path
+        )
+
+    async def _connection(self, reader, writer):
+        # Requests of one connection are answered as they finish, clients
+        # match responses by id
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):
+                    line = b""
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                # Released by _respond() once the request is answered
+                await self._pending.acquire()
+                task = asyncio.ensure_future(self._respond(line, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _respond(self, line, writer, write_lock):
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError as error:
+                self.errors += 1
+                response = {"id": None, "error": f"Invalid JSON: {error}"}
+            else:
+                response = await self.handle(request)
+            async with write_lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        finally:
+            self._pending.release()
+
+    def stats(self):
+        uptime = time.monotonic() - self.started
+        latencies = sorted(self._latencies)
+
+        def percentile(fraction):
+            if not latencies:
+                return 0.0
+            return latencies[min(int(fraction * len(latencies)), len(latencies) - 1)]
+
+        stats = {
+            "uptime_seconds": uptime,
+            "requests": self.requests,
+            "solves": self.solves,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "in_flight": len(self._in_flight),
+            "requests_per_second": self.requests / uptime if uptime else 0.0,
+            "latency_ms": {
+                "p50": percentile(0.5) * 1000,
+                "p90": percentile(0.9) * 1000,
+                "p99": percentile(0.99) * 1000,
+            },
+        }
+        if not self._processes:
+            # Worker processes keep their own caches
+            stats["path_cache"] = self.warehouse.path_cache.stats()
+        return stats
+
+    async def start(self, path=None, host="127.0.0.1", port=8765):
+        # Listens on a Unix socket when path is given, TCP otherwise
+        if path:
+            return await asyncio.start_unix_server(
+                self._connection, path=path, limit=LINE_LIMIT
+            )
+        return await asyncio.start_server(
+            self._connection, host, port, limit=LINE_LIMIT
+        )
+
+    def close(self):
+        self._executor.shutdown()
+
+
+async def serve(warehouse, path=None, host="127.0.0.1", port=8765, **kwargs):
+    service = RoutingService(warehouse, **kwargs)
+    server = await service.start(path, host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve routes over JSON lines")
+    add_warehouse_arguments(parser)
+    parser.add_argument("--socket", help="Unix socket path instead of TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--processes", type=int, default=0, help="solve in worker processes"
+    )
+    parser.add_argument("--max-pending", type=int, default=256)
+    parser.add_argument("--corridors", action="store_true")
+    args = parser.parse_args(argv)
+
+    warehouse = warehouse_from_args(args)
+    if args.corridors:
+        warehouse.enable_corridors()
+
+    try:
+        asyncio.run(
+            serve(
+                warehouse,
+                args.socket,
+                args.host,
+                args.port,
+                processes=args.processes,
+                max_pending=args.max_pending,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from sequencing import UNREACHABLE
+from simulation import add_warehouse_arguments, warehouse_from_args
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def alias_table(weights):
+    # Vose's alias method: drawing column k uniformly and keeping it with
+    # probability probabilities[k], else taking aliases[k], samples
+    # proportional to weights in O(1) per draw
+    count = len(weights)
+    scaled = np.asarray(weights, dtype=np.float64) * count / np.sum(weights)
+    probabilities = np.ones(count)
+    aliases = np.arange(count)
+    small = [index for index in range(count) if scaled[index] < 1.0]
+    large = [index for index in range(count) if scaled[index] >= 1.0]
+    while small and large:
+        less = small.pop()
+        more = large[-1]
+        probabilities[less] = scaled[less]
+        aliases[less] = more
+        scaled[more] -= 1.0 - scaled[less]
+        if scaled[more] < 1.0:
+            small.append(large.pop())
+    return probabilities, aliases
+
+
+def step_matrix(distances):
+    # int32 copy of the distance matrix with one extra column that costs
+    # more than any real step, a location index of len(distances) is one
+    # that is already visited or only padding
+    size = len(distances)
+    steps = np.full((size, size + 1), np.iinfo(np.int32).max, dtype=np.int32)
+    steps[:, :size] = np.where(distances < 0, UNREACHABLE, distances)
+    return steps
+
+
+def nearest_neighbour_lengths(steps, locations, start, printer):
+    # Tour lengths of many orders at once. locations is an (orders, items)
+    # array of indices into step_matrix(), padded with its extra column.
+    # Every order walks from start to its nearest unvisited location until
+    # none is left and then to printer; ties go to the lower column
+    count, width = locations.shape
+    stride = steps.shape[1]
+    done = stride - 1
+    flat = steps.ravel()
+    rows = np.arange(count)
+    locations = locations.copy()
+    sizes = (locations != done).sum(axis=1)
+    current = np.full(count, start, dtype=np.intp)
+    totals = np.zeros(count, dtype=np.int64)
+    for step in range(width):
+        active = step < sizes
+        candidates = np.take(flat, (current * stride)[:, None] + locations)
+        choice = candidates.argmin(axis=1)
+        totals += np.where(active, candidates[rows, choice], 0)
+        current = np.where(active, locations[rows, choice], current)
+        locations[rows, choice] = done
+    return totals + np.take(flat, current * stride + printer)
+
+
+def listed_order_lengths(steps, locations, start, printer):
+    # Tour lengths visiting the locations in the listed order, the same
+    # distances simulate_order walks
+    count, width = locations.shape
+    stride = steps.shape[1]
+    done = stride - 1
+    flat = steps.ravel()
+    if not width:
+        return np.full(count, flat[start * stride + printer], dtype=np.int64)
+    padding = locations == done
+    sizes = width - padding.sum(axis=1)
+    # Padding repeats the last location, which adds distance 0
+    last = np.where(
+        sizes > 0, locations[np.arange(count), np.maximum(sizes - 1, 0)], start
+    )
+    route = np.where(padding, last[:, None], locations)
+    totals = np.take(flat, start * stride + route[:, 0]).astype(np.int64)
+    totals += np.take(flat, route[:, :-1] * stride + route[:, 1:]).sum(
+        axis=1, dtype=np.int64
+    )
+    return totals + np.take(flat, route[:, -1] * stride + printer)
+
+
+class ScenarioEngine:
+    # Monte-Carlo demand scenarios on the warehouse distance matrix. Orders
+    # are sampled in bulk as index arrays and tour lengths are computed
+    # with gathers over the matrix, never calling simulate_order
+    def __init__(self, warehouse, step_time=1.0, chunk_size=16384):
+        if warehouse.distance_matrix is None or any(
+            location not in warehouse._point_index
+            for location in warehouse.pick_points()
+        ):
+            warehouse.build_distance_matrix()
+        warehouse.refresh_distance_matrix()
+        self.steps = step_matrix(np.asarray(warehouse.distance_matrix))
+        self.start = warehouse._point_index[warehouse.start]
+        self.printer = warehouse._point_index[warehouse.printer]
+        self.items = sorted(warehouse.item_locations)
+        self.placement = np.array(
+            [
+                warehouse._point_index[warehouse.item_locations[item]]
+                for item in self.items
+            ],
+            dtype=np.intp,
+        )
+        self.step_time = step_time
+        self.chunk_size = chunk_size
+
+    def sample_orders(self, rng, count, min_items=1, max_items=5, popularity=None):
+        # (count, max_items) array of item indices padded with -1. Order
+        # sizes are uniform like layout_generator.random_orders and items
+        # are drawn with replacement according to popularity
+        sizes = rng.integers(min_items, max_items + 1, size=count)
+        orders = rng.integers(len(self.items), size=(count, max_items))
+        if popularity is not None:
+            probabilities, aliases = alias_table(popularity)
+            keep = rng.random((count, max_items)) < probabilities[orders]
+            orders = np.where(keep, orders, aliases[orders])
+        orders[np.arange(max_items)[None, :] >= sizes[:, None]] = -1
+        return orders
+
+    def zipf_popularity(self, rng, skew=1.0):
+        # Zipf like weights over a random ranking of the items, so every
+        # scenario gets its own SKU mix
+        weights = 1.0 / np.arange(1, len(self.items) + 1) ** skew
+        weights = weights[rng.permutation(len(self.items))]
+        return weights / weights.sum()
+
+    def tour_lengths(self, orders, placement=None, sequence="nearest"):
+        # Walking distance of every order in an item index array, see
+        # sample_orders(). sequence is "nearest" for nearest neighbour or
+        # "listed" for the order as given
+        if sequence == "nearest":
+            lengths = nearest_neighbour_lengths
+        elif sequence == "listed":
+            lengths = listed_order_lengths
+        else:
+            raise ValueError(f"Unknown sequence {sequence}")
+        placement = self.placement if placement is None else placement
+        # Item -1 maps to the extra column of the step matrix
+        placement = np.append(placement, len(self.steps))
+        results = []
+        for begin in range(0, len(orders), self.chunk_size):
+            locations = placement[orders[begin : begin + self.chunk_size]]
+            results.append(lengths(self.steps, locations, self.start, self.printer))
+        if not results:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(results)
+
+    def run(
+        self,
+        orders=100000,
+        min_items=1,
+        max_items=5,
+        skew=1.0,
+        shuffle_placement=False,
+        sequence="nearest",
+        seed=0,
+        name=None,
+    ):
+        # Samples one scenario and summarizes its tour lengths. With
+        # shuffle_placement the items swap locations at random
+        rng = np.random.default_rng(seed)
+        started = time.perf_counter()
+        popularity = self.zipf_popularity(rng, skew)
+        placement = (
+            rng.permutation(self.placement) if shuffle_placement else self.placement
+        )
+        sampled = self.sample_orders(rng, orders, min_items, max_items, popularity)
+        lengths = self.tour_lengths(sampled, placement, sequence)
+        elapsed = time.perf_counter() - started
+        summary = summarize(lengths, self.step_time)
+        summary["name"] = name if name is not None else f"scenario-{seed}"
+        summary["orders_per_second"] = orders / elapsed if elapsed else 0.0
+        return summary
+
+    def run_many(self, scenarios, seed=0):
+        # scenarios is a list of run() keyword dicts, each one gets its own
+        # seed unless it sets one
+        return [
+            self.run(**{"seed": seed + index, **scenario})
+            for index, scenario in enumerate(scenarios)
+        ]
+
+
+def summarize(lengths, step_time=1.0):
+    failed = lengths >= UNREACHABLE
+    lengths = lengths[~failed]
+    summary = {"orders": int(len(lengths)), "failed": int(failed.sum())}
+    if len(lengths):
+        values = np.percentile(lengths, PERCENTILES)
+        total = int(lengths.sum())
+        summary.update(
+            {
+                "mean": float(lengths.mean()),
+                "std": float(lengths.std()),
+                "max": int(lengths.max()),
+                "total_distance": total,
+                "walking_hours": total * step_time / 3600,
+            }
+        )
+        summary.update(
+            {f"p{percent}": float(value) for percent, value in zip(PERCENTILES, values)}
+        )
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte-Carlo demand scenarios")
+    add_warehouse_arguments(parser)
+    parser.add_argument(
+        "--scenarios", help="JSON file with a list of run() keyword objects"
+    )
+    parser.add_argument("--count", type=int, default=10, help="random scenarios")
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--min-items", type=int, default=1)
+    parser.add_argument("--max-items", type=int, default=5)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--shuffle-placement", action="store_true")
+    parser.add_argument("--sequence", choices=["nearest", "listed"], default="nearest")
+    parser.add_argument("--step-time", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the summaries to this JSON file")
+    args = parser.parse_args(argv)
+
+    warehouse = warehouse_from_args(args)
+    engine = ScenarioEngine(warehouse, step_time=args.step_time)
+
+    if args.scenarios:
+        with open(args.scenarios) as scenarios_file:
+            scenarios = json.load(scenarios_file)
+    else:
+        scenarios = [
+            {
+                "orders": args.orders,
+                "min_items": args.min_items,
+                "max_items": args.max_items,
+                "skew": args.skew,
+                "shuffle_placement": args.shuffle_placement,
+                "sequence": args.sequence,
+            }
+        ] * args.count
+    summaries = engine.run_many(scenarios, args.seed)
+
+    for summary in summaries:
+        if not summary["orders"]:
+            print(f"{summary['name']}: no reachable orders", file=sys.stderr)
+            continue
+        print(
+            f"{summary['name']}: mean {summary['mean']:.1f} "
+            f"p50 {summary['p50']:.0f} p99 {summary['p99']:.0f} "
+            f"{summary['walking_hours']:.1f} walking hours, "
+            f"{summary['failed']} failed, "
+            f"{summary['orders_per_second']:.0f} orders/s",
+            file=sys.stderr,
+        )
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(summaries, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
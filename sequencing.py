@@ -0,0 +1,170 @@
+import time
+
+# Cost used for unreachable pairs so the local search can still compare routes
+UNREACHABLE = 10**9
+
+
+# All functions work on a square cost matrix where index 0 is the start,
+# the last index is the printer and 1..n are the items to pick. Costs may
+# be asymmetric because of the one-way aisles. Routes are lists of item
+# indices, start and printer are implied.
+
+
+def route_cost(matrix, route):
+    end = len(matrix) - 1
+    cost = 0
+    previous = 0
+    for node in route:
+        cost += matrix[previous][node]
+        previous = node
+    return cost + matrix[previous][end]
+
+
+def held_karp(matrix):
+    # Exact dynamic programming over subsets, O(2^n * n^2)
+    item_count = len(matrix) - 2
+    if item_count <= 0:
+        return []
+    end = item_count + 1
+    full = (1 << item_count) - 1
+
+    # cost[mask][j]: cheapest route from the start over the items in mask
+    # that ends at item j + 1
+    cost = [[UNREACHABLE * end] * item_count for _ in range(full + 1)]
+    parent = [[-1] * item_count for _ in range(full + 1)]
+    for j in range(item_count):
+        cost[1 << j][j] = matrix[0][j + 1]
+
+    for mask in range(1, full + 1):
+        row = cost[mask]
+        for j in range(item_count):
+            if not mask & (1 << j):
+                continue
+            base = row[j]
+            distances = matrix[j + 1]
+            for k in range(item_count):
+                if mask & (1 << k):
+                    continue
+                next_mask = mask | (1 << k)
+                candidate = base + distances[k + 1]
+                if candidate < cost[next_mask][k]:
+                    cost[next_mask][k] = candidate
+                    parent[next_mask][k] = j
+
+    last = min(range(item_count), key=lambda j: cost[full][j] + matrix[j + 1][end])
+    route = []
+    mask = full
+    while last != -1:
+        route.append(last + 1)
+        last, mask = parent[mask][last], mask & ~(1 << last)
+    route.reverse()
+    return route
+
+
+def nearest_neighbour(matrix):
+    remaining = set(range(1, len(matrix) - 1))
+    route = []
+    current = 0
+    while remaining:
+        current = min(remaining, key=matrix[current].__getitem__)
+        remaining.remove(current)
+        route.append(current)
+    return route
+
+
+def two_opt(matrix, route, deadline=None):
+    # Segment reversal. Forward and backward prefix sums give O(1) deltas
+    # even though reversing a segment changes its cost on one-way aisles
+    end = len(matrix) - 1
+    improved = True
+    while improved:
+        improved = False
+        tour = [0] + route + [end]
+        forward = [0]
+        backward = [0]
+        for a, b in zip(tour, tour[1:]):
+            forward.append(forward[-1] + matrix[a][b])
+            backward.append(backward[-1] + matrix[b][a])
+
+        for i in range(1, len(tour) - 2):
+            if deadline is not None and time.perf_counter() > deadline:
+                return route
+            before = tour[i - 1]
+            for j in range(i + 1, len(tour) - 1):
+                after = tour[j + 1]
+                old = (
+                    matrix[before][tour[i]]
+                    + forward[j]
+                    - forward[i]
+                    + matrix[tour[j]][after]
+                )
+                new = (
+                    matrix[before][tour[j]]
+                    + backward[j]
+                    - backward[i]
+                    + matrix[tour[i]][after]
+                )
+                if new < old:
+                    route[i - 1 : j] = route[i - 1 : j][::-1]
+                    improved = True
+                    break
+            if improved:
+                break
+    return route
+
+
+def or_opt(matrix, route, deadline=None, max_segment=3):
+    # Move segments of up to max_segment items to a better position,
+    # keeping their direction
+    end = len(matrix) - 1
+    improved = True
+    while improved:
+        improved = False
+        for length in range(1, max_segment + 1):
+            for i in range(len(route) - length + 1):
+                if deadline is not None and time.perf_counter() > deadline:
+                    return route
+                tour = [0] + route + [end]
+                first = tour[i + 1]
+                last = tour[i + length]
+                before = tour[i]
+                after = tour[i + length + 1]
+                removed = (
+                    matrix[before][first] + matrix[last][after] - matrix[before][after]
+                )
+                segment = route[i : i + length]
+                rest = route[:i] + route[i + length :]
+                rest_tour = [0] + rest + [end]
+                for k in range(len(rest_tour) - 1):
+                    if k == i:
+                        continue
+                    a = rest_tour[k]
+                    b = rest_tour[k + 1]
+                    added = matrix[a][first] + matrix[last][b] - matrix[a][b]
+                    if added < removed:
+                        route[:] = rest[:k] + segment + rest[k:]
+                        improved = True
+                        break
+                if improved:
+                    break
+            if improved:
+                break
+    return route
+
+
+def optimize_sequence(matrix, time_budget=None, exact_limit=8):
+    item_count = len(matrix) - 2
+    if item_count <= exact_limit:
+        return held_karp(matrix)
+
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    route = nearest_neighbour(matrix)
+    best_cost = route_cost(matrix, route)
+    while deadline is None or time.perf_counter() < deadline:
+        two_opt(matrix, route, deadline)
+        or_opt(matrix, route, deadline)
+        cost = route_cost(matrix, route)
+        if cost >= best_cost:
+            break
+        best_cost = cost
+    return route
@@ -1,15 +1,189 @@
+import csv
 import heapq
+import hashlib
+import os
 from itertools import combinations, permutations
 from collections import deque
+from array import array
+from multiprocessing import Pool
+
+from corridors import CorridorGraph
+from dynamic_routing import LifelongPlanner
+from instrumentation import INSTRUMENTED_METHODS, WarehouseStats
+from path_cache import PathCache
+from sequencing import UNREACHABLE, optimize_sequence, route_cost
+
+BASIC_DIRECTIONS = {"^": (-1, 0), "v": (1, 0), "<": (0, -1), ">": (0, 1)}
+# Part of the distance matrix key, bumped when the saved files change
+MATRIX_FORMAT = 2
+
+
+def _bfs_distances(offsets, targets, source, point_nodes):
+    # Breadth-first search from a single source node. Returns the distance
+    # and the first hop (node id after the source) for every point node,
+    # -1 where the point is unreachable
+    distance = {source: 0}
+    first_hop = {source: source}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        next_distance = distance[node] + 1
+        for index in range(offsets[node], offsets[node + 1]):
+            next_node = targets[index]
+            if next_node not in distance:
+                distance[next_node] = next_distance
+                first_hop[next_node] = next_node if node == source else first_hop[node]
+                queue.append(next_node)
+
+    return (
+        [distance.get(node, -1) for node in point_nodes],
+        [first_hop.get(node, -1) for node in point_nodes],
+    )
+
+
+def _bfs_tree(offsets, targets, source, node_count):
+    # Breadth-first search tree from source over all nodes: distance,
+    # parent and first hop of every node, -1 where unreachable
+    distances = [-1] * node_count
+    parents = [-1] * node_count
+    first_hops = [-1] * node_count
+    distances[source] = 0
+    first_hops[source] = source
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        next_distance = distances[node] + 1
+        for index in range(offsets[node], offsets[node + 1]):
+            next_node = targets[index]
+            if distances[next_node] < 0:
+                distances[next_node] = next_distance
+                parents[next_node] = node
+                first_hops[next_node] = (
+                    next_node if node == source else first_hops[node]
+                )
+                queue.append(next_node)
+    return distances, parents, first_hops
+
+
+def _bfs_parents(offsets, targets, source, point_nodes):
+    # Distances from source to the point nodes and the parent of every node
+    # in the shortest path tree of source
+    distances, parents, _ = _bfs_tree(offsets, targets, source, len(offsets) - 1)
+    return [distances[node] for node in point_nodes], array("i", parents)
+
+
+def load_layout(filename):
+    # Each row of the CSV file is a row of the warehouse
+    with open(filename, newline="") as csvfile:
+        return [row for row in csv.reader(csvfile)]
+
+
+def load_item_locations(filename):
+    # CSV file with the columns item, row, col
+    item_locations = {}
+    with open(filename, newline="") as csvfile:
+        for row in csv.DictReader(csvfile):
+            item_locations[row["item"]] = (int(row["row"]), int(row["col"]))
+    return item_locations
+
+
+def add_warehouse_arguments(parser):
+    # Command line options for warehouse_from_args()
+    parser.add_argument("--layout", default="warehouse_layout.csv")
+    parser.add_argument("--items", required=True, help="CSV with item,row,col")
+    parser.add_argument("--start", default="20,0", help="row,col of the start")
+    parser.add_argument("--printer", default="21,0", help="row,col of the printer")
+
+
+def warehouse_from_args(args):
+    # Warehouse with layout, start, printer and items from parsed arguments
+    warehouse = Warehouse(load_layout(args.layout))
+    warehouse.set_start(tuple(int(value) for value in args.start.split(",")))
+    warehouse.set_printer(tuple(int(value) for value in args.printer.split(",")))
+    for item, location in load_item_locations(args.items).items():
+        warehouse.add_item_location(item, location)
+    return warehouse
+
+
+_pool_graph = None
+
+
+def _init_bfs_worker(offsets, targets, point_nodes):
+    global _pool_graph
+    _pool_graph = (offsets, targets, point_nodes)
+
+
+def _bfs_worker(source):
+    offsets, targets, point_nodes = _pool_graph
+    return _bfs_distances(offsets, targets, source, point_nodes)
+
+
+def _tree_worker(source):
+    offsets, targets, point_nodes = _pool_graph
+    return _bfs_parents(offsets, targets, source, point_nodes)
+
+
+def bfs_distance_rows(offsets, targets, sources, point_nodes, processes=None):
+    # One BFS per source node over a CSR graph, optionally across a process
+    # pool. Returns a (distances, first hops) pair of rows per source
+    if processes and processes > 1:
+        with Pool(
+            processes,
+            initializer=_init_bfs_worker,
+            initargs=(offsets, targets, point_nodes),
+        ) as pool:
+            return pool.map(_bfs_worker, sources)
+    return [
+        _bfs_distances(offsets, targets, source, point_nodes) for source in sources
+    ]
+
+
+def bfs_tree_rows(offsets, targets, sources, point_nodes, processes=None):
+    # Like bfs_distance_rows(), but with the parents of every node in the
+    # shortest path tree of the source instead of the first hops
+    if processes and processes > 1:
+        with Pool(
+            processes,
+            initializer=_init_bfs_worker,
+            initargs=(offsets, targets, point_nodes),
+        ) as pool:
+            return pool.map(_tree_worker, sources)
+    return [_bfs_parents(offsets, targets, source, point_nodes) for source in sources]
 
 
 class Warehouse:
-    def __init__(self, layout):
+    def __init__(self, layout, path_cache=None):
         self.layout = layout
         self.item_locations = {}
         self.start = None
         self.printer = None
-        self.path_cache = {}  # Hinzugefügt für das Caching von Pfaden
+        # Hinzugefügt für das Caching von Pfaden, bounded and packed
+        if path_cache is None:
+            path_cache = PathCache(max_bytes=64 * 1024 * 1024)
+        self.path_cache = path_cache
+        # Opt-in instrumentation, see enable_stats()
+        self.stats = None
+        # Compiled adjacency, built lazily by compile_layout()
+        self._rows = 0
+        self._cols = 0
+        self._offsets = None
+        self._targets = None
+        # All-pairs distances between pick points, see build_distance_matrix()
+        self.distance_matrix = None
+        # Optional parent of every node in the shortest path tree of every
+        # pick point, so paths between pick points need no search
+        self.parent_matrix = None
+        self._point_index = {}
+        # Rows of the matrices that cell changes left stale, rebuilt on use,
+        # and the full shortest path trees of the pick points that find them
+        self._stale_rows = set()
+        self._point_trees = None
+        # Cells closed at runtime, see block_cell()
+        self.blocked_cells = set()
+        # Routes repaired incrementally on layout changes, see track_route()
+        self._tracked_routes = {}
+        # Contracted corridor graph, see enable_corridors()
+        self.corridors = None
 
     def set_start(self, start):
         self.start = start
@@ -20,6 +194,45 @@ class Warehouse:
     def add_item_location(self, item, location):
         self.item_locations[item] = location
 
+    def enable_stats(self, stats=None):
+        # Instruments find_path, _add_to_queue, get_path and simulate_order.
+        # Without stats the methods run uninstrumented
+        if self.stats is not None:
+            self.stats.detach(self)
+        stats = stats or WarehouseStats()
+        stats.attach(self)
+        return stats
+
+    def disable_stats(self):
+        if self.stats is not None:
+            self.stats.detach(self)
+
+    def enable_corridors(self, landmarks=0):
+        # Answers cache misses on the contracted corridor graph instead of
+        # cell by cell, which pays off on large floors with long aisles
+        self.corridors = CorridorGraph(self, landmarks)
+        return self.corridors
+
+    def disable_corridors(self):
+        self.corridors = None
+
+    def __getstate__(self):
+        # Instrumentation wrappers stay in the process that enabled them
+        state = self.__dict__.copy()
+        if self.stats is not None:
+            for method in INSTRUMENTED_METHODS + ("_add_to_queue",):
+                state.pop(method, None)
+            state["stats"] = None
+        state["_tracked_routes"] = {}
+        # Rebuilt on the next cell change
+        state["_point_trees"] = None
+        if isinstance(self._offsets, memoryview):
+            # Views into a memory-mapped layout, compile_layout() maps them
+            # again in the receiving process
+            state["_offsets"] = None
+            state["_targets"] = None
+        return state
+
     def manhattan_distance(self, start, end):
         return abs(start[0] - end[0]) + abs(start[1] - end[1])
 
@@ -44,64 +257,691 @@ class Warehouse:
 
         return directions_dict
 
+    def compile_layout(self):
+        # Compile the layout once into a CSR adjacency: node ids are
+        # row * width + col, the neighbours of node n are
+        # targets[offsets[n]:offsets[n + 1]]
+        if getattr(self.layout, "offsets", None) is not None and not self.blocked_cells:
+            # Compiled layout file that already carries the adjacency
+            self._rows = len(self.layout)
+            self._cols = len(self.layout[0])
+            self._offsets = self.layout.offsets
+            self._targets = self.layout.targets
+            return
+
+        directions = self.generate_direction_permutations(BASIC_DIRECTIONS)
+        rows = len(self.layout)
+        cols = len(self.layout[0])
+        blocked = {row * cols + col for row, col in self.blocked_cells}
+
+        offsets = array("i", [0])
+        targets = array("i")
+        for row in range(rows):
+            for col in range(cols):
+                for delta_row, delta_col in directions.get(self.layout[row][col], ()):
+                    next_row = row + delta_row
+                    next_col = col + delta_col
+                    if (
+                        0 <= next_row < rows
+                        and 0 <= next_col < cols
+                        and self.layout[next_row][next_col] != "X"
+                    ):
+                        next_node = next_row * cols + next_col
+                        if next_node not in blocked:
+                            targets.append(next_node)
+                offsets.append(len(targets))
+
+        self._rows = rows
+        self._cols = cols
+        self._offsets = offsets
+        self._targets = targets
+
     def find_path(self, start, end):
-        if (start, end) in self.path_cache:
-            return self.path_cache[(start, end)]
+        cached_path = self.path_cache.get((start, end))
+        if cached_path is not None:
+            return cached_path
 
-        # Open set as a heap queue
-        open_set = []
-        heapq.heappush(
-            open_set, (0 + self.manhattan_distance(start, end), 0, start, [start])
-        )
+        nodes = self.point_path_nodes(start, end)
+        if nodes is not None:
+            cols = self._cols
+            path = [divmod(node, cols) for node in nodes]
+            if path:
+                self.path_cache[(start, end)] = path
+            return path
 
-        basic_directions = {"^": (-1, 0), "v": (1, 0), "<": (0, -1), ">": (0, 1)}
+        if self.corridors is not None:
+            path = self.corridors.find_path(start, end)
+            if path:
+                self.path_cache[(start, end)] = path
+            return path
+
+        if self._offsets is None:
+            self.compile_layout()
+
+        cols = self._cols
+        start_node = start[0] * cols + start[1]
+        end_node = end[0] * cols + end[1]
 
-        directions = self.generate_direction_permutations(basic_directions)
+        # Open set as a heap queue, parent pointers instead of per-entry paths
+        open_set = [(self.manhattan_distance(start, end), 0, start_node)]
+        costs = {start_node: 0}
+        parents = {start_node: -1}
+        closed = set()
 
         while open_set:
-            _, cost, current_position, path = heapq.heappop(open_set)
+            _, cost, current_node = heapq.heappop(open_set)
 
-            if current_position == end:
+            if current_node == end_node:
+                path = []
+                while current_node != -1:
+                    path.append(divmod(current_node, cols))
+                    current_node = parents[current_node]
+                path.reverse()
                 self.path_cache[(start, end)] = path
                 return path
 
-            current_row, current_col = current_position
-            cell_value = self.layout[current_row][current_col]
-            if cell_value in directions:
-                next_steps = directions[cell_value]
-                if isinstance(next_steps[0], tuple):
-                    for step in next_steps:
-                        self._add_to_queue(
-                            step, cost, current_row, current_col, path, open_set, end
-                        )
-                else:
-                    self._add_to_queue(
-                        next_steps, cost, current_row, current_col, path, open_set, end
-                    )
+            if current_node in closed:
+                continue
+            closed.add(current_node)
+
+            self._add_to_queue(current_node, cost, open_set, costs, parents, end)
 
         return []
 
-    def _add_to_queue(self, step, cost, current_row, current_col, path, open_set, end):
-        delta_row, delta_col = step
-        next_position = (current_row + delta_row, current_col + delta_col)
-
-        if (
-            0 <= next_position[0] < len(self.layout)
-            and 0 <= next_position[1] < len(self.layout[0])
-            and self.layout[next_position[0]][next_position[1]] != "X"
-            and next_position not in path
-        ):
-            new_path = path + [next_position]
-            new_cost = cost + 1
-            heapq.heappush(
-                open_set,
-                (
-                    new_cost + self.manhattan_distance(next_position, end),
-                    new_cost,
-                    next_position,
-                    new_path,
-                ),
+    def _add_to_queue(self, node, cost, open_set, costs, parents, end):
+        end_row, end_col = end
+        cols = self._cols
+        new_cost = cost + 1
+        targets = self._targets
+
+        for index in range(self._offsets[node], self._offsets[node + 1]):
+            next_node = targets[index]
+            if new_cost < costs.get(next_node, new_cost + 1):
+                costs[next_node] = new_cost
+                parents[next_node] = node
+                next_row, next_col = divmod(next_node, cols)
+                heapq.heappush(
+                    open_set,
+                    (
+                        new_cost + abs(next_row - end_row) + abs(next_col - end_col),
+                        new_cost,
+                        next_node,
+                    ),
+                )
+
+    def pick_points(self):
+        # Start, printer and every distinct item location, in a stable order
+        points = [self.start, self.printer]
+        for location in sorted(set(self.item_locations.values())):
+            if location not in points:
+                points.append(location)
+        return points
+
+    def distance_matrix_key(self):
+        digest = hashlib.sha256(f"{MATRIX_FORMAT}\n".encode())
+        for row in self.layout:
+            digest.update(",".join(row).encode())
+            digest.update(b"\n")
+        for point in self.pick_points():
+            digest.update(f"{point[0]},{point[1]};".encode())
+        for row, col in sorted(self.blocked_cells):
+            digest.update(f"!{row},{col};".encode())
+        return digest.hexdigest()
+
+    def build_distance_matrix(self, processes=None, paths=False):
+        # One BFS per pick point; every edge costs 1 so BFS distances are
+        # the same as the A* distances of find_path. With paths the BFS
+        # trees are kept as well to expand the paths between pick points,
+        # which takes points x cells instead of points x points memory
+        import numpy as np
+
+        if not self.start or not self.printer:
+            raise ValueError("Start or printer location not set")
+        if self._offsets is None:
+            self.compile_layout()
+
+        points = self.pick_points()
+        point_nodes = [row * self._cols + col for row, col in points]
+        if paths:
+            results = bfs_tree_rows(
+                self._offsets, self._targets, point_nodes, point_nodes, processes
+            )
+            self.parent_matrix = np.stack(
+                [np.frombuffer(row, dtype=np.int32) for _, row in results]
+            )
+        else:
+            results = bfs_distance_rows(
+                self._offsets, self._targets, point_nodes, point_nodes, processes
+            )
+            self.parent_matrix = None
+
+        self.distance_matrix = np.array([row for row, _ in results], dtype=np.int32)
+        self._point_index = {point: index for index, point in enumerate(points)}
+        self._stale_rows = set()
+        self._point_trees = None
+
+    def save_distance_matrix(self, filename):
+        import numpy as np
+
+        if self.distance_matrix is None:
+            raise ValueError("Distance matrix not built")
+        self.refresh_distance_matrix()
+        points = sorted(self._point_index, key=self._point_index.get)
+        arrays = {
+            "key": np.array(self.distance_matrix_key()),
+            "points": np.array(points, dtype=np.int32),
+            "distances": self.distance_matrix,
+        }
+        if self.parent_matrix is not None:
+            arrays["parents"] = self.parent_matrix
+        with open(filename, "wb") as matrix_file:
+            np.savez(matrix_file, **arrays)
+
+    def load_distance_matrix(self, filename):
+        import numpy as np
+
+        with np.load(filename) as data:
+            if str(data["key"]) != self.distance_matrix_key():
+                raise ValueError(f"Distance matrix {filename} does not match layout")
+            points = [tuple(int(value) for value in point) for point in data["points"]]
+            self.distance_matrix = data["distances"]
+            self.parent_matrix = data["parents"] if "parents" in data.files else None
+        self._point_index = {point: index for index, point in enumerate(points)}
+        self._stale_rows = set()
+        self._point_trees = None
+
+    def load_or_build_distance_matrix(
+        self, cache_dir="distance_cache", processes=None, paths=False
+    ):
+        suffix = "-paths" if paths else ""
+        filename = os.path.join(cache_dir, f"{self.distance_matrix_key()}{suffix}.npz")
+        if os.path.exists(filename):
+            self.load_distance_matrix(filename)
+            return filename
+
+        self.build_distance_matrix(processes=processes, paths=paths)
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first so concurrent workers never load
+        # a half written matrix
+        temporary = f"{filename}.{os.getpid()}.tmp"
+        self.save_distance_matrix(temporary)
+        os.replace(temporary, filename)
+        return filename
+
+    def refresh_distance_matrix(self):
+        # Rebuilds the rows that cell changes left stale, call it before
+        # reading distance_matrix or parent_matrix directly
+        if self._stale_rows:
+            self._rebuild_matrix_rows(self._stale_rows)
+
+    def distance(self, start, end):
+        # O(1) lookup for pick points, falls back to find_path otherwise.
+        # Returns None if end is unreachable from start
+        start_index = self._point_index.get(start)
+        end_index = self._point_index.get(end)
+        if start_index is not None and end_index is not None:
+            if start_index in self._stale_rows:
+                self._rebuild_matrix_rows([start_index])
+            distance = int(self.distance_matrix[start_index, end_index])
+            return distance if distance >= 0 else None
+
+        if (start, end) in self.path_cache:
+            return self.path_cache.distance((start, end))
+
+        if self.corridors is not None:
+            return self.corridors.distance(start, end)
+
+        path = self.find_path(start, end)
+        return len(path) - 1 if path else None
+
+    def point_path_nodes(self, start, end):
+        # Node ids of the shortest path between two pick points, read from
+        # the parent tree of start. [] if end is unreachable, None without a
+        # distance matrix or if start or end is no pick point
+        if self.parent_matrix is None:
+            return None
+        start_index = self._point_index.get(start)
+        end_index = self._point_index.get(end)
+        if start_index is None or end_index is None:
+            return None
+        if self._offsets is None:
+            self.compile_layout()
+        if start_index in self._stale_rows:
+            self._rebuild_matrix_rows([start_index])
+        if self.distance_matrix[start_index, end_index] < 0:
+            return []
+
+        parent = self.parent_matrix[start_index].item
+        node = end[0] * self._cols + end[1]
+        nodes = []
+        while node != -1:
+            nodes.append(node)
+            node = parent(node)
+        nodes.reverse()
+        return nodes
+
+    def block_cell(self, cell):
+        # Closes a walkable cell, e.g. for restocking, until unblock_cell()
+        if cell not in self.blocked_cells:
+            self._change_cells([cell], lambda: self.blocked_cells.add(cell))
+
+    def unblock_cell(self, cell):
+        if cell in self.blocked_cells:
+            self._change_cells([cell], lambda: self.blocked_cells.discard(cell))
+
+    def set_cell(self, cell, value):
+        # Changes the directions of a cell, "X" turns it into a rack. The
+        # layout is edited in place
+        row, col = cell
+        if not isinstance(self.layout, list):
+            # Memory-mapped layouts are read-only, edit a copy instead
+            self.layout = [list(layout_row) for layout_row in self.layout]
+
+        def apply():
+            self.layout[row][col] = value
+
+        self._change_cells([cell], apply)
+
+    def track_route(self, start, end):
+        # Keeps the path from start to end in the path cache and repairs it
+        # with LPA* whenever the layout changes. Returns the current path
+        planner = LifelongPlanner(self, start, end)
+        self._tracked_routes[(start, end)] = planner
+        path = planner.path()
+        if path:
+            self.path_cache[(start, end)] = path
+        return path
+
+    def untrack_route(self, start, end):
+        self._tracked_routes.pop((start, end), None)
+
+    def _cell_targets(self, node, directions):
+        # Out-neighbours of node in the current layout, as compile_layout()
+        # would build them
+        rows = self._rows
+        cols = self._cols
+        row, col = divmod(node, cols)
+        targets = []
+        for delta_row, delta_col in directions.get(self.layout[row][col], ()):
+            next_row = row + delta_row
+            next_col = col + delta_col
+            if (
+                0 <= next_row < rows
+                and 0 <= next_col < cols
+                and self.layout[next_row][next_col] != "X"
+                and (next_row, next_col) not in self.blocked_cells
+            ):
+                targets.append(next_row * cols + next_col)
+        return targets
+
+    def _successors(self, node):
+        offsets = self._offsets
+        return self._targets[offsets[node] : offsets[node + 1]]
+
+    def _predecessors(self, node):
+        offsets = self._offsets
+        targets = self._targets
+        cols = self._cols
+        row, col = divmod(node, cols)
+        predecessors = []
+        for delta_row, delta_col in BASIC_DIRECTIONS.values():
+            other_row = row + delta_row
+            other_col = col + delta_col
+            if 0 <= other_row < self._rows and 0 <= other_col < cols:
+                other = other_row * cols + other_col
+                if node in targets[offsets[other] : offsets[other + 1]]:
+                    predecessors.append(other)
+        return predecessors
+
+    def _change_cells(self, cells, apply):
+        # Applies a layout change and invalidates only what it affects:
+        # cached paths through removed edges, cached paths that a new edge
+        # may shorten and the distance matrix rows of affected pick points.
+        # All of it is decided from the edited cells and their neighbours.
+        # An invalidated cached path is dropped and searched again with A*
+        # when it is next asked for, only routes registered with
+        # track_route() are repaired in place with LPA*
+        if self._offsets is None:
+            self.compile_layout()
+        if not isinstance(self._targets, array):
+            # Views into a memory-mapped layout are read-only
+            self._offsets = array("i", self._offsets)
+            self._targets = array("i", self._targets)
+        offsets = self._offsets
+        targets = self._targets
+        rows = self._rows
+        cols = self._cols
+
+        nodes = set()
+        for row, col in cells:
+            nodes.add(row * cols + col)
+            for delta_row, delta_col in BASIC_DIRECTIONS.values():
+                if 0 <= row + delta_row < rows and 0 <= col + delta_col < cols:
+                    nodes.add((row + delta_row) * cols + col + delta_col)
+        before = {node: set(self._successors(node)) - {node} for node in sorted(nodes)}
+        apply()
+        directions = self.generate_direction_permutations(BASIC_DIRECTIONS)
+        after = {node: self._cell_targets(node, directions) for node in before}
+        removed = [
+            (node, target)
+            for node in before
+            for target in before[node]
+            if target not in after[node]
+        ]
+        added = [
+            (node, target)
+            for node in before
+            for target in after[node]
+            if target not in before[node]
+        ]
+        if not removed and not added:
+            return
+
+        # Removing edges only lengthens paths through them
+        stale_keys = set()
+        for node, target in removed:
+            stale_keys |= self.path_cache.keys_through(
+                divmod(node, cols)
+            ) & self.path_cache.keys_through(divmod(target, cols))
+
+        if all(len(after[node]) <= offsets[node + 1] - offsets[node] for node in after):
+            for node, node_targets in after.items():
+                start = offsets[node]
+                for index in range(start, offsets[node + 1]):
+                    # Unused slots loop back to the node itself, which
+                    # find_path and the BFS never follow
+                    slot = index - start
+                    targets[index] = (
+                        node_targets[slot] if slot < len(node_targets) else node
+                    )
+        else:
+            self.compile_layout()
+
+        # A cached path from s to t can only get shorter through a shortcut
+        # x -> y, and not if even the Manhattan distances around it are
+        # too long
+        shortcuts = self._shortcuts(before, after) if added else []
+        if self.distance_matrix is not None and self._point_trees is None:
+            self._stale_rows |= self._stale_point_rows(removed, shortcuts)
+        if shortcuts and len(self.path_cache):
+            shortcuts = [
+                (divmod(node, cols), divmod(other, cols), length)
+                for node, other, length in shortcuts
+            ]
+            for key, steps in self.path_cache.path_lengths():
+                if key in self._tracked_routes:
+                    # LPA* repairs tracked routes below
+                    continue
+                (start_row, start_col), (end_row, end_col) = key
+                for (node_row, node_col), (other_row, other_col), length in shortcuts:
+                    if (
+                        abs(start_row - node_row)
+                        + abs(start_col - node_col)
+                        + length
+                        + abs(other_row - end_row)
+                        + abs(other_col - end_col)
+                        < steps
+                    ):
+                        stale_keys.add(key)
+                        break
+
+        for key in stale_keys:
+            self.path_cache.discard(key)
+        if self._point_trees is not None:
+            self._stale_rows |= self._update_point_trees(before, after, removed)
+        if self.corridors is not None:
+            self.corridors.update(self, nodes)
+
+        changed = {target for _, target in added} | {target for _, target in removed}
+        for key, planner in self._tracked_routes.items():
+            previous = planner.distance()
+            planner.edges_changed(changed)
+            if key in self.path_cache and planner.distance() == previous:
+                # No removed edge on it and nothing shorter, keep the path
+                continue
+            path = planner.path()
+            if path:
+                self.path_cache[key] = path
+            else:
+                self.path_cache.discard(key)
+
+    def _shortcuts(self, before, after):
+        # (x, y, length) for edited cells x and y where a path among the
+        # edited cells is shorter than the old distance from x to y. Any
+        # path that got shorter passes through one of them, as every other
+        # edge is unchanged
+        shortcuts = []
+        for node in after:
+            # Distances among the edited cells after the change
+            lengths = {node: 0}
+            queue = deque([node])
+            while queue:
+                current = queue.popleft()
+                for target in after[current]:
+                    if target in after and target not in lengths:
+                        lengths[target] = lengths[current] + 1
+                        queue.append(target)
+            # Old distances, searched no further than the new ones
+            limit = max(lengths.values())
+            old = {node: 0}
+            queue = deque([node])
+            while queue:
+                current = queue.popleft()
+                if old[current] == limit:
+                    continue
+                successors = before.get(current)
+                if successors is None:
+                    successors = self._successors(current)
+                for target in successors:
+                    if target not in old:
+                        old[target] = old[current] + 1
+                        queue.append(target)
+            shortcuts.extend(
+                (node, other, length)
+                for other, length in lengths.items()
+                if other != node and old.get(other, limit + 1) > length
+            )
+        return shortcuts
+
+    def _point_nodes(self):
+        cols = self._cols
+        return [
+            row * cols + col
+            for row, col in sorted(self._point_index, key=self._point_index.get)
+        ]
+
+    def build_point_trees(self):
+        # Keeps the shortest path tree of every pick point: distance, parent
+        # and first hop per cell, rows in matrix order. Cell changes then
+        # repair the trees and rebuild fewer matrix rows than the Manhattan
+        # bound of _stale_point_rows() allows, at 12 bytes per pick point
+        # and cell. Call it after build_distance_matrix()
+        import numpy as np
+
+        if self.distance_matrix is None:
+            raise ValueError("Distance matrix not built")
+        if self._offsets is None:
+            self.compile_layout()
+        point_nodes = self._point_nodes()
+        node_count = len(self._offsets) - 1
+        self._point_trees = tuple(
+            np.empty((len(point_nodes), node_count), dtype=np.int32)
+            for _ in range(3)
+        )
+        for index, source in enumerate(point_nodes):
+            tree = _bfs_tree(self._offsets, self._targets, source, node_count)
+            for part, values in zip(self._point_trees, tree):
+                part[index] = values
+        if self.parent_matrix is not None:
+            # Repaired in place from now on
+            self.parent_matrix = self._point_trees[1]
+        # Stale rows come for free
+        distances = self._point_trees[0]
+        for index in self._stale_rows:
+            self.distance_matrix[index] = distances[index, point_nodes]
+        self._stale_rows = set()
+
+    def _stale_point_rows(self, removed, shortcuts):
+        # Matrix rows a change may affect when no point trees are kept. A
+        # step moves one cell, so a path from s over x -> y to t is at least
+        # |s - x| + length + |y - t| long. A removed edge can only be on a
+        # shortest path that bound does not exceed, a shortcut can only
+        # help where the bound is below the current distance
+        import numpy as np
+
+        if not self._point_index:
+            return set()
+        points = np.array(sorted(self._point_index, key=self._point_index.get))
+        distances = self.distance_matrix.astype(np.int64)
+        reachable = distances >= 0
+        distances[~reachable] = np.iinfo(np.int64).max // 2
+
+        def manhattan(node):
+            row, col = divmod(node, self._cols)
+            return np.abs(points[:, 0] - row) + np.abs(points[:, 1] - col)
+
+        stale = np.zeros(len(points), dtype=bool)
+        for node, target in removed:
+            bound = manhattan(node)[:, None] + 1 + manhattan(target)[None, :]
+            stale |= (reachable & (bound <= distances)).any(axis=1)
+        for node, other, length in shortcuts:
+            bound = manhattan(node)[:, None] + length + manhattan(other)[None, :]
+            stale |= (bound < distances).any(axis=1)
+        return set(np.flatnonzero(stale).tolist())
+
+    def _update_point_trees(self, before, after, removed):
+        # Repairs the point trees after the edges of the cells in before
+        # changed. Returns the rows whose distances or first hops change
+        # beyond those cells, their trees are only rebuilt with the row
+        import numpy as np
+
+        distances, parents, first_hops = self._point_trees
+        sources = np.array(self._point_nodes())
+        points = set(sources.tolist())
+        stale = np.zeros(len(sources), dtype=bool)
+        stale[list(self._stale_rows)] = True
+
+        def hop(node, target):
+            # First hop of target when reached over node
+            return np.where(sources == node, target, first_hops[:, node])
+
+        # A node whose tree edge was removed keeps its subtree as long as
+        # another predecessor reaches it at the same distance with the same
+        # first hop. That predecessor must not hang below any detached node,
+        # which holds when it is no deeper than all of them
+        detached = {}
+        for node, target in removed:
+            mask = parents[:, target] == node
+            detached[target] = detached[target] | mask if target in detached else mask
+        shallowest = np.full(len(sources), np.iinfo(np.int32).max)
+        for target, mask in detached.items():
+            shallowest = np.where(
+                mask, np.minimum(shallowest, distances[:, target]), shallowest
+            )
+        changed = True
+        while changed:
+            changed = False
+            for target, mask in detached.items():
+                if not mask.any():
+                    continue
+                for other in self._predecessors(target):
+                    keep = (
+                        mask
+                        & (distances[:, other] >= 0)
+                        & (distances[:, other] + 1 == distances[:, target])
+                        & (distances[:, other] <= shallowest)
+                        & (hop(other, target) == first_hops[:, target])
+                    )
+                    if other in detached:
+                        keep &= ~detached[other]
+                    if keep.any():
+                        parents[keep, target] = other
+                        mask &= ~keep
+                        changed = True
+        for target, mask in detached.items():
+            if not mask.any():
+                continue
+            # A leaf that no other cell reaches any more just disappears,
+            # everything else needs a new search
+            leaf = mask & (target not in points) & (not self._predecessors(target))
+            for child in before[target]:
+                attached = parents[:, child] == target
+                if child in detached:
+                    attached &= ~detached[child]
+                leaf &= ~attached
+            distances[leaf, target] = -1
+            parents[leaf, target] = -1
+            first_hops[leaf, target] = -1
+            stale |= mask & ~leaf
+
+        # New edges: relax the edited cells among themselves, a cell that
+        # gets closer and passes that on to a cell outside them, or that is
+        # a pick point, changes the row
+        unreached = np.iinfo(np.int64).max // 2
+
+        def reach(node):
+            column = distances[:, node].astype(np.int64)
+            return np.where(column >= 0, column, unreached)
+
+        closest = {node: reach(node) for node in after}
+        old = {node: closest[node].copy() for node in after}
+        via = {node: parents[:, node].copy() for node in after}
+        hops = {node: first_hops[:, node].copy() for node in after}
+        for _ in range(len(after)):
+            relaxed = False
+            for node in after:
+                for target in after[node]:
+                    if target not in after:
+                        continue
+                    better = closest[node] + 1 < closest[target]
+                    if better.any():
+                        relaxed = True
+                        closest[target] = np.where(
+                            better, closest[node] + 1, closest[target]
+                        )
+                        via[target] = np.where(better, node, via[target])
+                        hops[target] = np.where(
+                            better,
+                            np.where(sources == node, target, hops[node]),
+                            hops[target],
+                        )
+            if not relaxed:
+                break
+        improved = {}
+        for node in after:
+            better = closest[node] < old[node]
+            if not better.any():
+                continue
+            improved[node] = better
+            if node in points:
+                stale |= better
+            for target in after[node]:
+                if target not in after:
+                    stale |= better & (closest[node] + 1 < reach(target))
+        for node, better in improved.items():
+            keep = better & ~stale
+            distances[keep, node] = closest[node][keep]
+            parents[keep, node] = via[node][keep]
+            first_hops[keep, node] = hops[node][keep]
+        return set(np.flatnonzero(stale).tolist())
+
+    def _rebuild_matrix_rows(self, rows):
+        # Recomputes matrix rows and, once kept, their point trees
+        point_nodes = self._point_nodes()
+        node_count = len(self._offsets) - 1
+        for index in sorted(rows):
+            tree = _bfs_tree(
+                self._offsets, self._targets, point_nodes[index], node_count
             )
+            distances, parents, _ = tree
+            self.distance_matrix[index] = [distances[node] for node in point_nodes]
+            if self._point_trees is not None:
+                # parent_matrix, if kept, is the parents of the point trees
+                for part, values in zip(self._point_trees, tree):
+                    part[index] = values
+            elif self.parent_matrix is not None:
+                self.parent_matrix[index] = parents
+        self._stale_rows = self._stale_rows - set(rows)
 
     def get_path(self, orders):
         if not self.start or not self.printer:
@@ -166,8 +1006,64 @@ class Warehouse:
 
         return total_path, distances, total_distance
 
-if __name__ == "__main__":
-        
+    def optimize_order(self, orders, time_budget=0.05, exact_limit=8):
+        # Choose the visiting order from start over all items to the printer,
+        # exact for up to exact_limit items and local search above that
+        if not self.start or not self.printer:
+            raise ValueError("Start or printer location not set")
+
+        locations = [self.start]
+        for order in orders:
+            item_location = self.item_locations.get(order)
+            if not item_location:
+                raise ValueError(f"Item {order} location not found")
+            locations.append(item_location)
+        locations.append(self.printer)
+
+        matrix = []
+        for start in locations:
+            row = []
+            for end in locations:
+                distance = self.distance(start, end)
+                row.append(UNREACHABLE if distance is None else distance)
+            matrix.append(row)
+
+        route = optimize_sequence(matrix, time_budget, exact_limit)
+        return [orders[index - 1] for index in route], route_cost(matrix, route)
+
+    def simulate_optimized_order(self, orders, time_budget=0.05, exact_limit=8):
+        optimized_orders, _ = self.optimize_order(orders, time_budget, exact_limit)
+        path, distances, total_distance = self.simulate_order(optimized_orders)
+        return path, distances, total_distance, optimized_orders
+
+    def order_distances(self, orders):
+        # Same distances as simulate_order without building the path
+        if not self.start or not self.printer:
+            raise ValueError("Start or printer location not set")
+
+        distances = []
+        current_position = self.start
+
+        for order in orders:
+            item_location = self.item_locations.get(order)
+            if item_location:
+                distance_to_item = self.distance(current_position, item_location)
+                if distance_to_item is None:
+                    raise ValueError(f"Path to item {order} not found")
+                distances.append(distance_to_item)
+                current_position = item_location
+            else:
+                raise ValueError(f"Item {order} location not found")
+
+        distance_to_printer = self.distance(current_position, self.printer)
+        if distance_to_printer is None:
+            raise ValueError("Path to printer not found")
+        distances.append(distance_to_printer)
+
+        return distances, sum(distances)
+
+
+def main():
     warehouse_layout = [
         ["X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X","X", "X", "X", "X", "X", "X", "X", "X", "X", "X","X", "X", "X", "X", "X", "X", "X", "X", "X", "X","X", "X", "X", "X", "X", "X", "X", "X", "X", "X","X", "X", "X", "X", "X", "X", "X", "X", "X", "X","X", "X", "X", "X", "X", "X", "X", "X", "X", "X", "X"],
         [">v", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">v", ">v", ">v", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">", ">v", ">v", ">v", ">v", ">v"],
@@ -230,4 +1126,8 @@ if __name__ == "__main__":
     print(path)
     print(f"Path for order: {orders}")
     print(f"Individual distances: {distances}")
-    print(f"Total distance traveled: {total_distance}")
\ No newline at end of file
+    print(f"Total distance traveled: {total_distance}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import random
+import time
+from array import array
+from collections import Counter, defaultdict
+from itertools import combinations
+
+from sequencing import UNREACHABLE
+from simulation import Warehouse, bfs_distance_rows
+
+
+def item_statistics(orders, max_order_size=50):
+    # Pick frequency per item and co-pick counts per item pair. Orders with
+    # more than max_order_size distinct items only count towards frequencies
+    frequencies = Counter()
+    affinities = defaultdict(Counter)
+    for items in orders:
+        frequencies.update(items)
+        distinct = sorted(set(items))
+        if len(distinct) > max_order_size:
+            continue
+        for first, second in combinations(distinct, 2):
+            affinities[first][second] += 1
+            affinities[second][first] += 1
+    return frequencies, affinities
+
+
+def storage_slots(warehouse):
+    # Every rack cell next to a walkable cell is a slot, the walkable
+    # neighbour is where the picker stands to reach it
+    layout = warehouse.layout
+    rows = len(layout)
+    cols = len(layout[0])
+    slots = []
+    for row in range(rows):
+        for col in range(cols):
+            if layout[row][col] != "X":
+                continue
+            for delta_row, delta_col in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                access_row = row + delta_row
+                access_col = col + delta_col
+                if (
+                    0 <= access_row < rows
+                    and 0 <= access_col < cols
+                    and layout[access_row][access_col] != "X"
+                ):
+                    slots.append(((row, col), (access_row, access_col)))
+                    break
+    return slots
+
+
+def reverse_adjacency(offsets, targets):
+    # CSR adjacency with every edge flipped
+    node_count = len(offsets) - 1
+    counts = [0] * (node_count + 1)
+    for target in targets:
+        counts[target + 1] += 1
+    reverse_offsets = array("i", counts)
+    for node in range(node_count):
+        reverse_offsets[node + 1] += reverse_offsets[node]
+    fill = list(reverse_offsets[:-1])
+    reverse_targets = array("i", bytes(4 * len(targets)))
+    for node in range(node_count):
+        for index in range(offsets[node], offsets[node + 1]):
+            target = targets[index]
+            reverse_targets[fill[target]] = node
+            fill[target] += 1
+    return reverse_offsets, reverse_targets
+
+
+class SlottingOptimizer:
+    # Assigns items to storage slots so that frequently picked items sit
+    # close to start and printer and items picked together sit close to
+    # each other. The cost of an assignment is
+    #   sum(frequency * (start -> slot -> printer))
+    #   + affinity_weight * sum(co-picks * distance between the two slots)
+    # where the affinity sum runs over pairs in which either item is among
+    # the affinity_partners strongest partners of the other, so the cost
+    # change of a swap is O(partners). Distances between slots are only
+    # computed for the cells such items stand on
+    def __init__(
+        self, warehouse, affinity_weight=1.0, affinity_partners=10, processes=None
+    ):
+        if not warehouse.start or not warehouse.printer:
+            raise ValueError("Start or printer location not set")
+        if warehouse._offsets is None:
+            warehouse.compile_layout()
+
+        self.warehouse = warehouse
+        self.affinity_weight = affinity_weight
+        self.affinity_partners = affinity_partners
+        self.processes = processes
+
+        cols = warehouse._cols
+        offsets = warehouse._offsets
+        targets = warehouse._targets
+        start_node = warehouse.start[0] * cols + warehouse.start[1]
+        printer_node = warehouse.printer[0] * cols + warehouse.printer[1]
+
+        # Distances start -> cell and cell -> printer for every cell
+        all_nodes = range(len(offsets) - 1)
+        from_start = bfs_distance_rows(offsets, targets, [start_node], all_nodes)[0][0]
+        self._reverse = reverse_adjacency(offsets, targets)
+        to_printer = bfs_distance_rows(*self._reverse, [printer_node], all_nodes)[0][0]
+        self._depot_costs = [
+            first + second if first >= 0 and second >= 0 else UNREACHABLE
+            for first, second in zip(from_start, to_printer)
+        ]
+
+        self.slots = [
+            (rack, access)
+            for rack, access in storage_slots(warehouse)
+            if self._depot_costs[access[0] * cols + access[1]] < UNREACHABLE
+        ]
+        self._access_cells = sorted({access for _, access in self.slots})
+        self._access_index = {
+            access: index for index, access in enumerate(self._access_cells)
+        }
+        self._slot_access = [self._access_index[access] for _, access in self.slots]
+        self._slot_costs = [
+            self._depot_costs[access[0] * cols + access[1]] for _, access in self.slots
+        ]
+
+        self._access_nodes = [row * cols + col for row, col in self._access_cells]
+        # Rows of access_distances() by access cell index, filled on demand
+        self._distance_rows = {}
+
+    def access_distances(self, access):
+        # Symmetric walking distance from access cell index access to every
+        # access cell, one forward and one backward search on first use
+        row = self._distance_rows.get(access)
+        if row is None:
+            source = [self._access_nodes[access]]
+            offsets, targets = self.warehouse._offsets, self.warehouse._targets
+            forward, _ = bfs_distance_rows(
+                offsets, targets, source, self._access_nodes
+            )[0]
+            reverse_offsets, reverse_targets = self._reverse
+            backward, _ = bfs_distance_rows(
+                reverse_offsets, reverse_targets, source, self._access_nodes
+            )[0]
+            forward = [value if value >= 0 else UNREACHABLE for value in forward]
+            backward = [value if value >= 0 else UNREACHABLE for value in backward]
+            row = array(
+                "i", ((first + second) // 2 for first, second in zip(forward, backward))
+            )
+            self._distance_rows[access] = row
+        return row
+
+    def location_cost(self, location):
+        return self._depot_costs[location[0] * self.warehouse._cols + location[1]]
+
+    def optimize(
+        self, orders, iterations=200000, time_budget=None, seed=0, simulate=True
+    ):
+        # orders is a list of item lists from the order history. Returns a
+        # dict with the new item -> location map, the rack cell per item,
+        # the depot cost before and after, the change of the full modelled
+        # cost over the search and, with simulate, the walked distance of
+        # the history before and after
+        frequencies, affinities = item_statistics(orders)
+        items = sorted(set(self.warehouse.item_locations) | set(frequencies))
+        if len(items) > len(self.slots):
+            raise ValueError(
+                f"{len(items)} items do not fit into {len(self.slots)} slots"
+            )
+        item_index = {item: index for index, item in enumerate(items)}
+        frequency = [frequencies[item] for item in items]
+        # Strongest partners per item, made symmetric so that every pair is
+        # seen from both items and the swap delta below is exact
+        partners = [{} for _ in items]
+        for index, item in enumerate(items):
+            for partner, count in affinities[item].most_common(self.affinity_partners):
+                partners[index][item_index[partner]] = count
+                partners[item_index[partner]][index] = count
+        partners = [list(item_partners.items()) for item_partners in partners]
+
+        # Greedy start: most frequent items into the cheapest slots, which
+        # is already optimal without the affinity term
+        by_frequency = sorted(range(len(items)), key=lambda index: -frequency[index])
+        by_cost = sorted(range(len(self.slots)), key=self._slot_costs.__getitem__)
+        item_slot = [0] * len(items)
+        slot_item = [-1] * len(self.slots)
+        for item, slot in zip(by_frequency, by_cost):
+            item_slot[item] = slot
+            slot_item[slot] = item
+
+        slot_costs = self._slot_costs
+        slot_access = self._slot_access
+        access_distances = self.access_distances
+        weight = self.affinity_weight
+
+        def affinity_delta(item, old_slot, new_slot, other):
+            if not weight:
+                return 0
+            old_access = slot_access[old_slot]
+            new_access = slot_access[new_slot]
+            delta = 0
+            for partner, count in partners[item]:
+                if partner == other:
+                    continue
+                # Rows are kept per partner position, partners move less
+                # often than the random candidate slots
+                row = access_distances(slot_access[item_slot[partner]])
+                delta += count * (row[new_access] - row[old_access])
+            return weight * delta
+
+        rng = random.Random(seed)
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        slot_count = len(self.slots)
+        cost_change = 0
+        for iteration in range(iterations):
+            if deadline is not None and not iteration % 1000:
+                if time.perf_counter() > deadline:
+                    break
+            item = rng.randrange(len(items))
+            old_slot = item_slot[item]
+            new_slot = rng.randrange(slot_count)
+            if new_slot == old_slot:
+                continue
+            other = slot_item[new_slot]
+            delta = frequency[item] * (slot_costs[new_slot] - slot_costs[old_slot])
+            delta += affinity_delta(item, old_slot, new_slot, other)
+            if other != -1:
+                delta += frequency[other] * (
+                    slot_costs[old_slot] - slot_costs[new_slot]
+                )
+                delta += affinity_delta(other, new_slot, old_slot, item)
+            if delta < 0:
+                cost_change += delta
+                item_slot[item] = new_slot
+                slot_item[new_slot] = item
+                slot_item[old_slot] = other
+                if other != -1:
+                    item_slot[other] = old_slot
+
+        current_locations = self.warehouse.item_locations
+        result = {
+            "item_locations": {
+                item: self.slots[item_slot[index]][1]
+                for index, item in enumerate(items)
+            },
+            "racks": {
+                item: self.slots[item_slot[index]][0]
+                for index, item in enumerate(items)
+            },
+            "cost_before": sum(
+                frequencies[item] * self.location_cost(location)
+                for item, location in current_locations.items()
+            ),
+            "cost_after": sum(
+                frequency[index] * slot_costs[item_slot[index]]
+                for index in range(len(items))
+            ),
+            "model_cost_change": cost_change,
+        }
+        if simulate:
+            result["distance_before"], result["failed_before"] = self.evaluate(
+                orders, current_locations
+            )
+            result["distance_after"], result["failed_after"] = self.evaluate(
+                orders, result["item_locations"]
+            )
+        return result
+
+    def evaluate(self, orders, item_locations):
+        # Re-simulates the order history with the given item locations and
+        # returns (total distance, failed orders)
+        warehouse = Warehouse(self.warehouse.layout)
+        warehouse.set_start(self.warehouse.start)
+        warehouse.set_printer(self.warehouse.printer)
+        for item, location in item_locations.items():
+            warehouse.add_item_location(item, location)
+        warehouse.build_distance_matrix(processes=self.processes)
+
+        total_distance = 0
+        failed = 0
+        for items in orders:
+            try:
+                total_distance += warehouse.order_distances(items)[1]
+            except ValueError:
+                failed += 1
+        return total_distance, failed
@@ -0,0 +1,50 @@
+import json
+
+from batch import read_orders, simulate_stream
+from test_simulation import make_warehouse
+
+
+def test_malformed_lines_become_errors(tmp_path):
+    lines = [
+        json.dumps(["Item1", "Item2"]),
+        json.dumps({"order_id": "a", "items": ["Item3"]}),
+        json.dumps({"order_id": "b"}),
+        "{not json",
+        json.dumps({"order_id": "c", "items": "Item1"}),
+        json.dumps(7),
+        "",
+        json.dumps({"items": [["Item1"]]}),
+        json.dumps(["Item9"]),
+        json.dumps({"order_id": "d", "items": ["Item2"]}),
+    ]
+    filename = tmp_path / "orders.jsonl"
+    filename.write_text("\n".join(lines) + "\n")
+
+    warehouse = make_warehouse()
+    results = list(simulate_stream(warehouse, read_orders(str(filename))))
+    errors = {result["order_id"]: result.get("error") for result in results}
+    assert errors == {
+        1: None,
+        "a": None,
+        "b": "Order needs a list of items",
+        4: "Order needs a list of items",
+        "c": "Order needs a list of items",
+        6: "Order needs a list of items",
+        8: "unhashable type: 'list'",
+        9: "Item Item9 location not found",
+        "d": None,
+    }
+    assert results[-1]["total_distance"] == warehouse.order_distances(["Item2"])[1]
+
+
+def test_csv_rows_without_items_become_errors(tmp_path):
+    filename = tmp_path / "orders.csv"
+    filename.write_text("order_id,items\na,Item1;Item2\nb\n,Item3\n")
+
+    results = list(simulate_stream(make_warehouse(), read_orders(str(filename))))
+    assert [result["order_id"] for result in results] == ["a", "b", 4]
+    assert [result.get("error") for result in results] == [
+        None,
+        "Order needs a list of items",
+        None,
+    ]
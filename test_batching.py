@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from batching import BatchPlanner
+from layout_generator import random_orders
+from test_simulation import make_warehouse
+
+
+def make_orders(warehouse, count, seed=0):
+    items = sorted(warehouse.item_locations)
+    return {
+        f"Order{index}": order
+        for index, order in enumerate(
+            random_orders(items, count, random.Random(seed), max_items=4)
+        )
+    }
+
+
+@pytest.mark.parametrize("method", ["seed", "savings"])
+@pytest.mark.parametrize("max_orders", [None, 3])
+def test_batches_respect_the_cart(method, max_orders):
+    warehouse = make_warehouse(items=30)
+    orders = make_orders(warehouse, 60)
+    planner = BatchPlanner(warehouse, capacity=8, max_orders=max_orders, neighbours=5)
+    batches = planner.plan(orders, method)
+
+    planned = [order_id for batch in batches for order_id in batch]
+    assert sorted(planned) == sorted(orders)
+    for batch in batches:
+        assert sum(len(orders[order_id]) for order_id in batch) <= 8
+        if max_orders is not None:
+            assert len(batch) <= max_orders
+        total_distance = planner.simulate_batch(orders, batch)[2]
+        assert total_distance == planner.batch_cost(orders, batch)
+
+
+def test_savings_never_cost_more_than_single_orders():
+    warehouse = make_warehouse(items=30)
+    orders = make_orders(warehouse, 60, seed=1)
+    planner = BatchPlanner(warehouse, capacity=10)
+    batches = planner.plan(orders)
+    assert len(batches) < len(orders)
+
+    batched = sum(planner.batch_cost(orders, batch) for batch in batches)
+    single = sum(planner.batch_cost(orders, [order_id]) for order_id in orders)
+    assert batched <= single
+
+
+def test_order_larger_than_the_cart_is_rejected():
+    warehouse = make_warehouse()
+    planner = BatchPlanner(warehouse, capacity=2)
+    with pytest.raises(ValueError, match="Order big exceeds the cart capacity"):
+        planner.plan({"small": ["Item1"], "big": ["Item1", "Item2", "Item3"]})
@@ -0,0 +1,29 @@
+import pytest
+
+from benchmark import compare
+
+PARAMETERS = {"items": 200, "queries": 100, "orders": 200, "seed": 0}
+
+
+def run(corridors=False, **metrics):
+    parameters = dict(PARAMETERS, corridors=corridors)
+    return {"parameters": parameters, "sizes": {"1000": metrics}}
+
+
+def test_flags_regressions_beyond_tolerance():
+    baseline = run(orders_per_second=100.0, find_path_p50_ms=2.0, peak_memory_mb=10.0)
+    results = run(orders_per_second=70.0, find_path_p50_ms=3.0, peak_memory_mb=14.0)
+    regressions = compare(results, baseline, 0.25)
+    assert len(regressions) == 3
+    assert compare(baseline, baseline, 0.25) == []
+
+
+def test_ignores_noise_on_tiny_values():
+    baseline = run(peak_memory_mb=0.07, find_path_p50_ms=0.02, compile_seconds=0.001)
+    results = run(peak_memory_mb=0.09, find_path_p50_ms=0.05, compile_seconds=0.004)
+    assert compare(results, baseline, 0.25) == []
+
+
+def test_refuses_baselines_with_other_parameters():
+    with pytest.raises(ValueError, match="corridors"):
+        compare(run(corridors=True), run(), 0.25)
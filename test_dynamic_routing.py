@@ -0,0 +1,167 @@
+import random
+from collections import deque
+
+import pytest
+
+from simulation import BASIC_DIRECTIONS, Warehouse
+from test_simulation import make_warehouse
+
+CELL_VALUES = ["X", "<", ">", "^", "v", "<>", "^v", ">v", "<^", "^<>v"]
+
+
+def brute_force_distances(layout, blocked, source):
+    # Plain BFS over the layout, independent of the compiled adjacency
+    rows = len(layout)
+    cols = len(layout[0])
+    distances = {source: 0}
+    queue = deque([source])
+    while queue:
+        row, col = queue.popleft()
+        for direction in set(layout[row][col]) & set(BASIC_DIRECTIONS):
+            delta_row, delta_col = BASIC_DIRECTIONS[direction]
+            cell = (row + delta_row, col + delta_col)
+            if (
+                0 <= cell[0] < rows
+                and 0 <= cell[1] < cols
+                and layout[cell[0]][cell[1]] != "X"
+                and cell not in blocked
+                and cell not in distances
+            ):
+                distances[cell] = distances[(row, col)] + 1
+                queue.append(cell)
+    return distances
+
+
+def assert_shortest(warehouse, path, start, end, expected):
+    if expected is None:
+        assert path == []
+        return
+    assert path[0] == start and path[-1] == end
+    assert len(path) - 1 == expected
+    cols = warehouse._cols
+    for cell, following in zip(path, path[1:]):
+        assert following not in warehouse.blocked_cells
+        node = cell[0] * cols + cell[1]
+        assert following[0] * cols + following[1] in warehouse._successors(node)
+
+
+def random_edit(warehouse, rng, original):
+    rows = len(warehouse.layout)
+    cols = len(warehouse.layout[0])
+    walkable = [
+        (row, col)
+        for row in range(rows)
+        for col in range(cols)
+        if warehouse.layout[row][col] != "X"
+    ]
+    choice = rng.random()
+    if choice < 0.4:
+        warehouse.block_cell(rng.choice(walkable))
+    elif choice < 0.7 and warehouse.blocked_cells:
+        warehouse.unblock_cell(rng.choice(sorted(warehouse.blocked_cells)))
+    elif choice < 0.85:
+        # Mostly small edits around the existing aisles
+        row, col = rng.choice(walkable)
+        warehouse.set_cell((row, col), rng.choice(CELL_VALUES))
+    else:
+        row = rng.randrange(1, rows - 1)
+        col = rng.randrange(cols)
+        warehouse.set_cell((row, col), original[row][col])
+
+
+# None runs plain A*, otherwise the distance matrix, with or without its
+# parent and point trees, and the corridor graph with that many landmarks
+# are kept up to date as well
+@pytest.mark.parametrize(
+    "landmarks, paths, point_trees",
+    [(None, False, False), (0, False, False), (2, True, False), (2, True, True)],
+)
+@pytest.mark.parametrize("seed", range(4))
+def test_edits_match_brute_force(landmarks, paths, point_trees, seed):
+    rng = random.Random(seed)
+    warehouse = make_warehouse(items=6)
+    original = [list(row) for row in warehouse.layout]
+    points = warehouse.pick_points()
+    accelerated = landmarks is not None
+    if accelerated:
+        warehouse.build_distance_matrix(paths=paths)
+        if point_trees:
+            warehouse.build_point_trees()
+        warehouse.enable_corridors(landmarks)
+    tracked = [(warehouse.start, point) for point in points[2:5]]
+    tracked.append((points[3], warehouse.printer))
+    for start, end in tracked:
+        warehouse.track_route(start, end)
+    rows = len(warehouse.layout)
+    cols = len(warehouse.layout[0])
+
+    for _ in range(40):
+        random_edit(warehouse, rng, original)
+        layout = warehouse.layout
+        blocked = warehouse.blocked_cells
+        trees = {
+            point: brute_force_distances(layout, blocked, point) for point in points
+        }
+
+        # Everything still cached must be a shortest path
+        for key in list(warehouse.path_cache.keys()):
+            start, end = key
+            expected = brute_force_distances(layout, blocked, start).get(end)
+            assert_shortest(
+                warehouse, warehouse.path_cache.get(key), start, end, expected
+            )
+
+        for start, end in tracked:
+            assert (start, end) in warehouse.path_cache or trees[start].get(end) is None
+            path = warehouse.find_path(start, end)
+            assert_shortest(warehouse, path, start, end, trees[start].get(end))
+
+        for start in points:
+            for end in rng.sample(points, 4):
+                expected = trees[start].get(end)
+                assert warehouse.distance(start, end) == expected
+                path = warehouse.find_path(start, end)
+                assert_shortest(warehouse, path, start, end, expected)
+                if accelerated:
+                    assert warehouse.corridors.distance(start, end) == expected
+                if paths:
+                    nodes = warehouse.point_path_nodes(start, end)
+                    cells = [divmod(node, cols) for node in nodes]
+                    assert_shortest(warehouse, cells, start, end, expected)
+
+        if accelerated:
+            warehouse.refresh_distance_matrix()
+            for index, start in enumerate(points):
+                expected = [trees[start].get(end, -1) for end in points]
+                assert warehouse.distance_matrix[index].tolist() == expected
+
+        # Random cells away from the pick points
+        for _ in range(3):
+            start = (rng.randrange(rows), rng.randrange(cols))
+            end = (rng.randrange(rows), rng.randrange(cols))
+            if layout[start[0]][start[1]] == "X" or layout[end[0]][end[1]] == "X":
+                continue
+            expected = brute_force_distances(layout, blocked, start).get(end)
+            assert_shortest(
+                warehouse, warehouse.find_path(start, end), start, end, expected
+            )
+
+
+def test_corridors_follow_an_edit_that_closes_a_ring():
+    # After the edit the four cells form a loop without any junction
+    layout = [
+        ["X", "X", "X", "X"],
+        ["X", ">v", "v", "X"],
+        ["X", "^", "<", "X"],
+        ["X", "X", "X", "X"],
+    ]
+    warehouse = Warehouse(layout)
+    warehouse.enable_corridors()
+    warehouse.set_cell((1, 1), ">")
+    cells = [(1, 1), (1, 2), (2, 2), (2, 1)]
+    for start in cells:
+        distances = brute_force_distances(layout, set(), start)
+        for end in cells:
+            assert warehouse.corridors.distance(start, end) == distances[end]
+            path = warehouse.find_path(start, end)
+            assert_shortest(warehouse, path, start, end, distances[end])
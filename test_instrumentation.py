@@ -0,0 +1,51 @@
+from test_simulation import make_warehouse
+
+
+def test_counts_calls():
+    warehouse = make_warehouse()
+    stats = warehouse.enable_stats()
+    warehouse.simulate_order(["Item1", "Item2"])
+
+    snapshot = stats.snapshot()
+    assert snapshot["latency"]["simulate_order"]["count"] == 1
+    assert snapshot["latency"]["find_path"]["count"] == 3
+    assert snapshot["cache_misses"] == 3
+    assert snapshot["nodes_expanded"] > 0
+
+
+def test_snapshot_after_reset_records_calls():
+    warehouse = make_warehouse()
+    stats = warehouse.enable_stats()
+    warehouse.simulate_order(["Item1"])
+    stats.reset()
+    assert stats.snapshot()["latency"]["simulate_order"]["count"] == 0
+
+    warehouse.simulate_order(["Item1"])
+    warehouse.simulate_order(["Item2"])
+    snapshot = stats.snapshot()
+    assert snapshot["latency"]["simulate_order"]["count"] == 2
+    assert snapshot["latency"]["simulate_order"]["sum"] > 0
+    assert snapshot["cache_hits"] == 2
+    assert 'method="simulate_order"} 2' in stats.to_prometheus()
+
+
+def test_heap_counts_only_searches():
+    warehouse = make_warehouse()
+    stats = warehouse.enable_stats()
+    start, end = warehouse.pick_points()[2:4]
+    warehouse.find_path(start, start)
+    assert stats.heap_pushes == stats.heap_pops == 1
+    warehouse.find_path(start, end)
+    assert stats.heap_pushes >= stats.heap_pops > 1
+
+    for accelerate in (
+        lambda warehouse: warehouse.build_distance_matrix(paths=True),
+        lambda warehouse: warehouse.enable_corridors(),
+    ):
+        warehouse = make_warehouse()
+        accelerate(warehouse)
+        stats = warehouse.enable_stats()
+        warehouse.find_path(start, start)
+        warehouse.find_path(start, end)
+        assert stats.cache_misses == 2
+        assert stats.heap_pushes == stats.heap_pops == 0
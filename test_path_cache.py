@@ -0,0 +1,122 @@
+import random
+
+from path_cache import (
+    ENTRY_OVERHEAD,
+    INDEX_CELL_OVERHEAD,
+    PathCache,
+    pack_path,
+    unpack_path,
+)
+
+
+def random_path(rng, length):
+    path = [(rng.randrange(50), rng.randrange(50))]
+    for _ in range(length):
+        row, col = path[-1]
+        delta_row, delta_col = rng.choice([(-1, 0), (1, 0), (0, -1), (0, 1)])
+        path.append((row + delta_row, col + delta_col))
+    return path
+
+
+def test_cell_index_counts_against_max_bytes():
+    rng = random.Random(0)
+    cache = PathCache(max_bytes=64 * 1024)
+    for index in range(50):
+        cache.put((index, index), random_path(rng, 100))
+    unindexed = len(cache)
+    cache.index_cells()
+    assert cache.bytes <= cache.max_bytes
+    assert len(cache) < unindexed
+
+    for index in range(50, 500):
+        path = random_path(rng, rng.randrange(1, 200))
+        cache.put((index, index), path)
+        assert cache.bytes <= cache.max_bytes
+        if (index, index) in cache:
+            assert (index, index) in cache.keys_through(path[0])
+
+    # Every cached path is indexed, and the charged bytes match a fresh count
+    cells = set()
+    charged = 0
+    for key in list(cache.keys()):
+        path = cache.get(key)
+        cells.update(path)
+        assert all(key in cache.keys_through(cell) for cell in path)
+        charged += cache._size(cache._entries[key])
+    assert cache.bytes == charged + len(cells) * INDEX_CELL_OVERHEAD
+
+    for key in list(cache.keys()):
+        cache.discard(key)
+    assert cache.bytes == 0
+    assert cache.keys_through((0, 0)) == set()
+
+
+def straight_path(length):
+    return [(0, col) for col in range(length + 1)]
+
+
+def test_pack_roundtrip():
+    rng = random.Random(1)
+    for length in range(12):
+        path = random_path(rng, length)
+        assert unpack_path(*pack_path(path)) == path
+
+
+def test_lru_evicts_least_recently_used():
+    cache = PathCache(max_entries=3)
+    for key in "abc":
+        cache.put(key, straight_path(4))
+    assert cache.get("a") is not None
+    cache.put("d", straight_path(4))
+    assert set(cache.keys()) == {"a", "c", "d"}
+    assert cache.evictions == 1
+
+
+def test_lfu_evicts_least_frequently_used():
+    cache = PathCache(max_entries=3, policy="lfu")
+    for key in "abc":
+        cache.put(key, straight_path(4))
+    for _ in range(3):
+        cache.get("a")
+    cache.get("b")
+    cache.put("d", straight_path(4))
+    assert set(cache.keys()) == {"a", "b", "d"}
+    # Equal frequencies go in insertion order
+    cache.put("e", straight_path(4))
+    assert set(cache.keys()) == {"a", "b", "e"}
+    # Removing the only entry of the lowest frequency keeps eviction working
+    cache.discard("e")
+    cache.get("b")
+    cache.put("f", straight_path(4))
+    cache.put("g", straight_path(4))
+    assert set(cache.keys()) == {"a", "b", "g"}
+
+
+def test_max_bytes_and_counters():
+    path = straight_path(40)
+    size = len(pack_path(path)[2]) + ENTRY_OVERHEAD
+    cache = PathCache(max_bytes=size * 5)
+    for index in range(8):
+        cache[index] = path
+    assert len(cache) == 5
+    assert cache.bytes == size * 5
+
+    assert cache.get(7) == path
+    assert cache.distance(6) == 40
+    assert cache.get(0) is None
+    assert cache.distance(1) is None
+    assert cache.stats() == {
+        "entries": 5,
+        "bytes": size * 5,
+        "hits": 2,
+        "misses": 2,
+        "evictions": 3,
+    }
+    cache.reset_stats()
+    assert cache.stats()["hits"] == cache.stats()["misses"] == 0
+
+    cache.put(7, straight_path(4))
+    assert cache.distance(7) == 4
+    assert cache.bytes == size * 4 + len(pack_path(straight_path(4))[2]) + ENTRY_OVERHEAD
+    cache.clear()
+    assert len(cache) == 0 and cache.bytes == 0
@@ -0,0 +1,32 @@
+from layout_generator import random_orders
+from picker_simulation import PickerSimulation
+from test_simulation import make_warehouse
+
+
+def test_single_picker_walks_shortest_routes():
+    warehouse = make_warehouse()
+    simulation = PickerSimulation(warehouse, 1, pick_time=10.0, print_time=20.0)
+    items = ["Item1", "Item2", "Item3"]
+    route, service = simulation.route(items)
+    assert simulation.route(list(items)) is simulation.route(items)
+
+    _, distances, total_distance = warehouse.simulate_order(items)
+    return_distance = len(warehouse.find_path(warehouse.printer, warehouse.start)) - 1
+    assert len(route) - 1 == total_distance + return_distance
+    assert sorted(service.values()) == [10.0] * len(items) + [20.0]
+
+    report = simulation.run([(0.0, items)])
+    assert report["orders_completed"] == 1
+    assert report["simulated_time"] == len(route) - 1 + sum(service.values())
+
+
+def test_congested_pickers_finish_every_order():
+    warehouse = make_warehouse()
+    orders = [
+        (index * 2.0, items)
+        for index, items in enumerate(random_orders(warehouse.item_locations, 200))
+    ]
+    report = PickerSimulation(warehouse, 8).run(orders)
+    assert report["orders_completed"] == 200
+    assert report["orders_failed"] == 0
+    assert sum(picker["orders"] for picker in report["pickers"]) == 200
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from load_generator import generate_load
+from routing_client import RoutingClient
+from routing_service import RoutingService
+from test_simulation import make_warehouse
+
+
+def run_service(tmp_path, scenario, **kwargs):
+    # Runs scenario(connect) against a service on a Unix socket
+    async def main():
+        warehouse = make_warehouse()
+        service = RoutingService(warehouse, **kwargs)
+        path = str(tmp_path / "routing.sock")
+        server = await service.start(path)
+        try:
+            return await scenario(lambda: RoutingClient.connect(path), path)
+        finally:
+            server.close()
+            await server.wait_closed()
+            service.close()
+
+    return asyncio.run(main())
+
+
+def test_answers_requests_and_errors(tmp_path):
+    async def scenario(connect, path):
+        client = await connect()
+        try:
+            distances = await client.order_distances(["Item1", "Item2"])
+            order = await client.simulate_order(["Item1", "Item2"])
+            with pytest.raises(ValueError, match="Item9 location not found"):
+                await client.order_distances(["Item9"])
+            results = await client.batch(
+                [
+                    {"method": "order_distances", "items": ["Item1"]},
+                    {"method": "unknown", "items": ["Item1"]},
+                ]
+            )
+            return distances, order, results
+        finally:
+            await client.close()
+
+    distances, order, results = run_service(tmp_path, scenario)
+    assert distances["total_distance"] == order["total_distance"]
+    assert len(order["path"]) == order["total_distance"] + 1
+    assert "result" in results[0] and "error" in results[1]
+
+
+def test_idle_connections_hold_no_permit(tmp_path):
+    async def scenario(connect, path):
+        idle = [await asyncio.open_unix_connection(path) for _ in range(4)]
+        client = await connect()
+        try:
+            return await asyncio.wait_for(client.order_distances(["Item1"]), 5)
+        finally:
+            await client.close()
+            for _, writer in idle:
+                writer.close()
+
+    result = run_service(tmp_path, scenario, max_pending=4)
+    assert result["total_distance"] > 0
+
+
+def test_load_generator_coalesces_repeated_orders(tmp_path):
+    async def scenario(connect, path):
+        return await generate_load(
+            connect, requests=200, connections=2, concurrency=16, distinct=5
+        )
+
+    report = run_service(tmp_path, scenario, max_pending=8)
+    assert report["requests"] == 200
+    assert report["errors"] == 0
+    server = report["server"]
+    assert server["solves"] + server["coalesced"] == 200
@@ -0,0 +1,17 @@
+import numpy as np
+
+from scenarios import ScenarioEngine
+from test_simulation import make_warehouse
+
+
+def test_items_added_after_the_matrix_are_routed():
+    warehouse = make_warehouse(items=4)
+    warehouse.build_distance_matrix()
+    for item in ("Item5", "Item6"):
+        location = make_warehouse(items=6).item_locations[item]
+        warehouse.add_item_location(item, location)
+
+    engine = ScenarioEngine(warehouse)
+    orders = np.array([[engine.items.index("Item6"), engine.items.index("Item5")]])
+    expected = warehouse.simulate_order(["Item6", "Item5"])[2]
+    assert engine.tour_lengths(orders, sequence="listed").tolist() == [expected]
@@ -0,0 +1,61 @@
+import random
+from itertools import permutations
+
+from sequencing import (
+    UNREACHABLE,
+    held_karp,
+    nearest_neighbour,
+    optimize_sequence,
+    or_opt,
+    route_cost,
+    two_opt,
+)
+
+
+def random_matrix(rng, items, unreachable=0.0):
+    # Asymmetric like the one-way aisles, optionally with unreachable pairs
+    size = items + 2
+    matrix = [[rng.randint(1, 50) for _ in range(size)] for _ in range(size)]
+    for row in range(size):
+        for col in range(size):
+            if row == col:
+                matrix[row][col] = 0
+            elif rng.random() < unreachable:
+                matrix[row][col] = UNREACHABLE
+    return matrix
+
+
+def brute_force(matrix):
+    items = range(1, len(matrix) - 1)
+    return min(route_cost(matrix, list(route)) for route in permutations(items))
+
+
+def test_held_karp_matches_brute_force():
+    rng = random.Random(0)
+    for items in range(8):
+        for _ in range(10):
+            matrix = random_matrix(rng, items, unreachable=0.1)
+            route = held_karp(matrix)
+            assert sorted(route) == list(range(1, items + 1))
+            assert route_cost(matrix, route) == brute_force(matrix)
+
+
+def test_local_search_keeps_a_valid_route():
+    rng = random.Random(1)
+    for _ in range(20):
+        matrix = random_matrix(rng, 12)
+        start = nearest_neighbour(matrix)
+        for improve in (two_opt, or_opt):
+            route = improve(matrix, list(start))
+            assert sorted(route) == list(range(1, 13))
+            assert route_cost(matrix, route) <= route_cost(matrix, start)
+        route = optimize_sequence(matrix, time_budget=None)
+        assert route_cost(matrix, route) <= route_cost(matrix, start)
+
+
+def test_optimize_sequence_is_exact_up_to_the_limit():
+    rng = random.Random(2)
+    matrix = random_matrix(rng, 6)
+    assert route_cost(matrix, optimize_sequence(matrix, exact_limit=6)) == (
+        brute_force(matrix)
+    )
@@ -0,0 +1,64 @@
+from layout_generator import default_depot, generate_layout, random_item_locations
+from simulation import Warehouse
+
+
+def make_warehouse(items=8):
+    layout = generate_layout(6, 40, cross_aisle_spacing=12)
+    warehouse = Warehouse(layout)
+    start, printer = default_depot(layout)
+    warehouse.set_start(start)
+    warehouse.set_printer(printer)
+    for item, location in random_item_locations(layout, items).items():
+        warehouse.add_item_location(item, location)
+    return warehouse
+
+
+def assert_walkable(warehouse, path):
+    cols = warehouse._cols
+    for cell, following in zip(path, path[1:]):
+        node = cell[0] * cols + cell[1]
+        assert following[0] * cols + following[1] in warehouse._successors(node)
+
+
+def test_paths_between_pick_points_come_from_the_matrix(tmp_path):
+    searched = make_warehouse()
+    points = searched.pick_points()
+
+    built = make_warehouse()
+    built.load_or_build_distance_matrix(tmp_path, paths=True)
+    loaded = make_warehouse()
+    loaded.load_or_build_distance_matrix(tmp_path, paths=True)
+    stats = loaded.enable_stats()
+
+    for warehouse in (built, loaded):
+        for start in points:
+            for end in points:
+                expected = searched.find_path(start, end)
+                path = warehouse.find_path(start, end)
+                assert len(path) == len(expected)
+                if path:
+                    assert path[0] == start and path[-1] == end
+                    assert_walkable(warehouse, path)
+
+    assert loaded.simulate_order(["Item1", "Item2", "Item3"])[2] == (
+        searched.simulate_order(["Item1", "Item2", "Item3"])[2]
+    )
+    assert stats.nodes_expanded == 0
+
+
+def test_distance_matrix_keeps_no_parent_trees_by_default(tmp_path):
+    built = make_warehouse()
+    built.load_or_build_distance_matrix(tmp_path)
+    loaded = make_warehouse()
+    loaded.load_or_build_distance_matrix(tmp_path)
+    points = built.pick_points()
+
+    for warehouse in (built, loaded):
+        assert warehouse.parent_matrix is None
+        assert warehouse.distance_matrix.shape == (len(points), len(points))
+        assert warehouse.point_path_nodes(points[0], points[1]) is None
+        for start in points:
+            for end in points:
+                path = warehouse.find_path(start, end)
+                distance = warehouse.distance(start, end)
+                assert len(path) - 1 == (distance if distance is not None else -1)
@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from layout_generator import random_orders
+from slotting import SlottingOptimizer, item_statistics
+from test_simulation import make_warehouse
+
+
+def modelled_cost(optimizer, orders, item_locations):
+    # The cost of the SlottingOptimizer comment, computed from scratch
+    frequencies, affinities = item_statistics(orders)
+    pairs = {}
+    for item, partners in affinities.items():
+        for partner, count in partners.most_common(optimizer.affinity_partners):
+            pairs[tuple(sorted((item, partner)))] = count
+    cost = sum(
+        frequencies[item] * optimizer.location_cost(location)
+        for item, location in item_locations.items()
+    )
+    for (first, second), count in pairs.items():
+        row = optimizer.access_distances(
+            optimizer._access_index[item_locations[first]]
+        )
+        cost += (
+            optimizer.affinity_weight
+            * count
+            * row[optimizer._access_index[item_locations[second]]]
+        )
+    return cost
+
+
+def test_accumulated_deltas_match_the_recomputed_cost():
+    warehouse = make_warehouse(items=20)
+    items = sorted(warehouse.item_locations)
+    orders = list(random_orders(items, 300, random.Random(0), max_items=6))
+    optimizer = SlottingOptimizer(warehouse, affinity_weight=2.0, affinity_partners=3)
+
+    greedy = optimizer.optimize(orders, iterations=0, simulate=False)
+    result = optimizer.optimize(orders, iterations=5000, simulate=False)
+    assert result["model_cost_change"] < 0
+    assert modelled_cost(optimizer, orders, result["item_locations"]) == (
+        pytest.approx(
+            modelled_cost(optimizer, orders, greedy["item_locations"])
+            + result["model_cost_change"]
+        )
+    )
+    assert sorted(result["item_locations"]) == items
+    assert len(set(result["racks"].values())) == len(items)
+
+
+def test_more_items_than_slots_is_rejected():
+    warehouse = make_warehouse()
+    optimizer = SlottingOptimizer(warehouse)
+    orders = [[f"Extra{index}"] for index in range(len(optimizer.slots) + 1)]
+    with pytest.raises(ValueError, match="items do not fit into"):
+        optimizer.optimize(orders, simulate=False)
@@ -1,45 +1,33 @@
-import pygame
+import argparse
+import os
 import time
-import sys
-import csv
-
-from simulation import Warehouse
-
-warehouse_layout = []
-
-# Open the CSV file and read the contents into the warehouse_layout list
-with open("warehouse_layout.csv", newline="") as csvfile:
-    csvreader = csv.reader(csvfile)
-    for row in csvreader:
-        # Here we assume that your CSV file has each cell separated by commas,
-        # and each row is a new line in the CSV
-        warehouse_layout.append(row)
-
-warehouse = Warehouse(warehouse_layout)
-warehouse.set_start((20, 0))  # Set start location
-warehouse.set_printer((21, 0))  # Set printer/end location row 21 column 0
-# Define item locations
-warehouse.add_item_location("Item1", (7, 13))
-warehouse.add_item_location("Item2", (1, 3))
-warehouse.add_item_location("Item3", (28, 18))
-
-# Simulate order
-orders = ["Item1", "Item2", "Item3"]  # List of items in the order
-path, distances, total_distance = warehouse.simulate_order(orders)
-print(f"Path for order: {orders}")
-print(f"Individual distances: {distances}")
-print(f"Total distance traveled: {total_distance}")
-
-# Initialize pygame
-pygame.init()
-
-pygame.font.init()  # Initialize the font module
-font = pygame.font.Font(None, 24)  # Choose the default font and set the size
+
+import pygame
+
+from simulation import BASIC_DIRECTIONS, Warehouse, load_layout
+
+
+def load_warehouse(filename="warehouse_layout.csv"):
+    # Reads the layout CSV, each row of the file is a row of the warehouse.
+    # Compiled layout files are memory-mapped instead
+    if filename.endswith(".csv"):
+        warehouse = Warehouse(load_layout(filename))
+    else:
+        from layout_format import open_warehouse
+
+        warehouse = open_warehouse(filename)
+    warehouse.set_start((20, 0))  # Set start location
+    warehouse.set_printer((21, 0))  # Set printer/end location row 21 column 0
+    # Define item locations
+    warehouse.add_item_location("Item1", (7, 13))
+    warehouse.add_item_location("Item2", (1, 3))
+    warehouse.add_item_location("Item3", (28, 18))
+    return warehouse
+
+
 # Constants for the display
 CELL_SIZE = 10
 CELL_MARGIN = 2
-WINDOW_WIDTH = len(warehouse.layout[0]) * (CELL_SIZE + CELL_MARGIN)
-WINDOW_HEIGHT = len(warehouse.layout) * (CELL_SIZE + CELL_MARGIN)
 
 # Colors
 BACKGROUND_COLOR = pygame.Color("white")
@@ -49,6 +37,18 @@ START_COLOR = pygame.Color("green")
 PRINTER_COLOR = pygame.Color("red")
 ITEM_COLOR = pygame.Color("orange")
 PICKER_COLOR = pygame.Color("blue")
+TEXT_COLOR = pygame.Color("black")
+# Colors of additional pickers when several routes are animated together
+PICKER_COLORS = [
+    PICKER_COLOR,
+    pygame.Color("purple"),
+    pygame.Color("darkgreen"),
+    pygame.Color("brown"),
+    pygame.Color("magenta"),
+    pygame.Color("navy"),
+    pygame.Color("darkorange"),
+    pygame.Color("teal"),
+]
 
 direction_symbols = {
     ">": ">",
@@ -67,22 +67,40 @@ direction_symbols = {
     # ... add more mappings for other combinations as needed ...
 }
 
-# Create the window
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption("Warehouse Picker Simulation")
+
+def cell_rect(row, col):
+    return pygame.Rect(
+        col * (CELL_SIZE + CELL_MARGIN),
+        row * (CELL_SIZE + CELL_MARGIN),
+        CELL_SIZE,
+        CELL_SIZE,
+    )
+
+
+def floor_size(warehouse):
+    return (
+        len(warehouse.layout[0]) * (CELL_SIZE + CELL_MARGIN),
+        len(warehouse.layout) * (CELL_SIZE + CELL_MARGIN),
+    )
 
 
-def draw_warehouse():
+def draw_warehouse(screen, warehouse):
+    # Draws the static floor: racks, aisles with their direction, start,
+    # printer and item locations
+    direction_cells = warehouse.generate_direction_permutations(BASIC_DIRECTIONS)
+    font = pygame.font.Font(None, CELL_SIZE)
+    # One rendered text surface per distinct cell value
+    labels = {}
+    item_locations = set(warehouse.item_locations.values())
+
     for row_index, row in enumerate(warehouse.layout):
         for col_index, cell in enumerate(row):
-            x = col_index * (CELL_SIZE + CELL_MARGIN)
-            y = row_index * (CELL_SIZE + CELL_MARGIN)
-            rect = pygame.Rect(x, y, CELL_SIZE, CELL_SIZE)
+            rect = cell_rect(row_index, col_index)
 
             # Determine the color based on the cell type
             if cell == "X":
                 color = RACK_COLOR
-            elif cell in direction_symbols.keys():
+            elif cell in direction_symbols:
                 color = PATH_COLOR
             else:
                 color = BACKGROUND_COLOR
@@ -91,78 +109,179 @@ def draw_warehouse():
             pygame.draw.rect(screen, color, rect)
 
             # Draw the direction symbol
-            if cell in warehouse.generate_direction_permutations(
-                {"^": (-1, 0), "v": (1, 0), "<": (0, -1), ">": (0, 1)}
-            ):
-                # Use a larger font size if needed
-                font = pygame.font.Font(None, CELL_SIZE)
-                text_surface = font.render(cell, True, pygame.Color("black"))
+            if cell in direction_cells:
+                text_surface = labels.get(cell)
+                if text_surface is None:
+                    text_surface = font.render(cell, True, TEXT_COLOR)
+                    labels[cell] = text_surface
                 # Center the text
                 screen.blit(text_surface, text_surface.get_rect(center=rect.center))
 
             # Highlight start, printer, and item locations
             if (row_index, col_index) == warehouse.start:
-                color = START_COLOR
-                pygame.draw.rect(screen, color, rect)
+                pygame.draw.rect(screen, START_COLOR, rect)
             elif (row_index, col_index) == warehouse.printer:
-                color = PRINTER_COLOR
-                pygame.draw.rect(screen, color, rect)
-            elif (row_index, col_index) in warehouse.item_locations.values():
-                color = ITEM_COLOR
-                pygame.draw.rect(screen, color, rect)
-
-
-def draw_path(path):
-    for index, position in enumerate(
-        path
-    ):  # Enumerate to get both the index and the position
-
-        row, col = position
-        rect = pygame.Rect(
-            col * (CELL_SIZE + CELL_MARGIN),
-            row * (CELL_SIZE + CELL_MARGIN),
-            CELL_SIZE,
-            CELL_SIZE,
-        )
-        pygame.draw.rect(screen, PICKER_COLOR, rect)
-        pygame.display.flip()  # Update the display to show the new color
-        if index == len(path) - 1:
-            # Render and display distances after reaching the printer
-            distances_text = f"Individual distances: {distances}"
-            total_distance_text = f"Total distance traveled: {total_distance}"
-
-            distances_surface = font.render(distances_text, True, pygame.Color("black"))
-            total_distance_surface = font.render(
-                total_distance_text, True, pygame.Color("black")
+                pygame.draw.rect(screen, PRINTER_COLOR, rect)
+            elif (row_index, col_index) in item_locations:
+                pygame.draw.rect(screen, ITEM_COLOR, rect)
+
+
+def render_floor(warehouse):
+    # The static floor is drawn once into its own surface and blitted from
+    # there, so frames only touch the cells that change
+    floor = pygame.Surface(floor_size(warehouse))
+    floor.fill(BACKGROUND_COLOR)
+    draw_warehouse(floor, warehouse)
+    return floor
+
+
+def animate_paths(
+    screen,
+    floor,
+    paths,
+    fps=20,
+    trail=True,
+    frames_dir=None,
+    sprite_sheet=None,
+    sprite_columns=10,
+    sprite_scale=0.25,
+):
+    # Moves one picker per path a cell per frame. With a display the loop
+    # runs at fps and only pushes the changed cells to the screen. Frames
+    # can be written to frames_dir and/or collected into a sprite sheet.
+    # Returns the number of frames drawn
+    screen.blit(floor, (0, 0))
+    displayed = pygame.display.get_surface() is screen
+    if displayed:
+        pygame.display.flip()
+    clock = pygame.time.Clock()
+    if frames_dir:
+        os.makedirs(frames_dir, exist_ok=True)
+    sheet_frames = []
+
+    previous = [None] * len(paths)
+    frames = max((len(path) for path in paths), default=0)
+    for frame in range(frames):
+        dirty = []
+        for index, path in enumerate(paths):
+            if frame >= len(path):
+                continue
+            if previous[index] is not None and not trail:
+                # Restore the floor below the old position
+                screen.blit(floor, previous[index], previous[index])
+                dirty.append(previous[index])
+            rect = cell_rect(*path[frame])
+            pygame.draw.rect(screen, PICKER_COLORS[index % len(PICKER_COLORS)], rect)
+            dirty.append(rect)
+            previous[index] = rect
+
+        if displayed:
+            pygame.event.pump()
+            pygame.display.update(dirty)
+            clock.tick(fps)
+        if frames_dir:
+            pygame.image.save(
+                screen, os.path.join(frames_dir, f"frame_{frame:05d}.png")
+            )
+        if sprite_sheet:
+            width, height = screen.get_size()
+            sheet_frames.append(
+                pygame.transform.smoothscale(
+                    screen,
+                    (
+                        max(int(width * sprite_scale), 1),
+                        max(int(height * sprite_scale), 1),
+                    ),
+                )
             )
 
-            screen.blit(
-                distances_surface, (50, WINDOW_HEIGHT - 50)
-            )  # Adjust position as needed
-            screen.blit(
-                total_distance_surface, (50, WINDOW_HEIGHT - 20)
-            )  # Adjust position as needed
+    if sprite_sheet and sheet_frames:
+        save_sprite_sheet(sheet_frames, sprite_sheet, sprite_columns)
+    return frames
+
+
+def save_sprite_sheet(frames, filename, columns=10):
+    width, height = frames[0].get_size()
+    rows = (len(frames) + columns - 1) // columns
+    sheet = pygame.Surface((width * min(columns, len(frames)), height * rows))
+    for index, frame in enumerate(frames):
+        sheet.blit(frame, ((index % columns) * width, (index // columns) * height))
+    pygame.image.save(sheet, filename)
+
+
+def draw_distances(screen, font, distances, total_distance):
+    # Render and display distances after reaching the printer
+    window_height = screen.get_height()
+    distances_text = f"Individual distances: {distances}"
+    total_distance_text = f"Total distance traveled: {total_distance}"
+
+    distances_surface = font.render(distances_text, True, TEXT_COLOR)
+    total_distance_surface = font.render(total_distance_text, True, TEXT_COLOR)
+
+    screen.blit(distances_surface, (50, window_height - 50))  # Adjust as needed
+    screen.blit(total_distance_surface, (50, window_height - 20))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Animate picker routes")
+    parser.add_argument("layout", nargs="?", default="warehouse_layout.csv")
+    parser.add_argument("--fps", type=int, default=20)
+    parser.add_argument(
+        "--headless", action="store_true", help="render without a display"
+    )
+    parser.add_argument("--frames-dir", help="write every frame as PNG here")
+    parser.add_argument("--sprite-sheet", help="write all frames into one PNG")
+    args = parser.parse_args(argv)
+
+    if args.headless:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+    warehouse = load_warehouse(args.layout)
+
+    # Simulate order
+    orders = ["Item1", "Item2", "Item3"]  # List of items in the order
+    path, distances, total_distance = warehouse.simulate_order(orders)
+    print(f"Path for order: {orders}")
+    print(f"Individual distances: {distances}")
+    print(f"Total distance traveled: {total_distance}")
+
+    # Initialize pygame
+    pygame.init()
+    font = pygame.font.Font(None, 24)  # Choose the default font and set the size
 
-            pygame.display.flip()  # Update the display with text
-            time.sleep(5)  # Show the screen with distances for 5 seconds
-            pygame.quit()
-            return
-        else:
-            time.sleep(0.05)  # Wait half a second to visualize the movement
+    if args.headless:
+        screen = pygame.Surface(floor_size(warehouse))
+    else:
+        # Create the window
+        screen = pygame.display.set_mode(floor_size(warehouse))
+        pygame.display.set_caption("Warehouse Picker Simulation")
 
+    floor = render_floor(warehouse)
+    animate_paths(
+        screen,
+        floor,
+        [path],
+        fps=args.fps,
+        frames_dir=args.frames_dir,
+        sprite_sheet=args.sprite_sheet,
+    )
+    draw_distances(screen, font, distances, total_distance)
 
-# Main loop
-running = True
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
+    if args.headless:
+        if args.frames_dir:
+            pygame.image.save(screen, os.path.join(args.frames_dir, "final.png"))
+    else:
+        pygame.display.flip()  # Update the display with text
+        # Show the screen with distances for 5 seconds or until closed
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                break
+            time.sleep(0.05)
 
-    screen.fill(BACKGROUND_COLOR)
-    draw_warehouse()
-    draw_path(path)  # `path` should be the path variable from your simulation
+    # Quit pygame
+    pygame.quit()
 
-    pygame.display.flip()
 
-# Quit pygame
-pygame.quit()
+if __name__ == "__main__":
+    main()